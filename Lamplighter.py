@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 import argparse
 import asyncio
-import base64
+import atexit
 import configparser
 import sys
 from urllib.parse import urlparse
 import colorama
 import fofa
-import xlsxwriter
+import exporter
 from prettytable import PrettyTable
 import nuclei
 import os
@@ -16,7 +16,14 @@ import requests
 import codecs
 import mmh3
 import time
+import math
+import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asset_store import AssetStore, asset_key, row_fingerprint
 from fastcheck import FastCheck
+from probe_store import ProbeStore
+from results import KeywordFilter, ResultSet, dedupe, parse_key_fields
 
 # 移除全局导入，改为按需导入
 combined_script_available = False
@@ -41,47 +48,77 @@ def banner():
     print(Fore.GREEN + f"[*]每页查询数量:{config.getint('size', 'size')}条/页")
 
 
-# 查询域名信息
-def search_domain(query_str, fields, no):
-    start_page = 1
-    end_page = 2
-    print(Fore.GREEN + f"[+] 正在查询第{no}个目标：{query_str}")
-    database = []
-    for page in range(start_page, end_page):  # 从第1页查到第N页
-        data = client.get_data(query_str, page=page, fields=fields)  # 查询第page页数据
-        database = database + data["results"]
+# 查询域名信息，targets为合并到这条查询语句中的目标数
+def search_domain(query_str, fields, targets=1):
+    # FOFA返回错误信息时重试也不会成功，直接放弃这条语句，已获取的页面照常返回
+    try:
+        data = client.get_data(query_str, page=1, fields=fields)
+    except RuntimeError as e:
+        print(Fore.RED + f"[!] 错误:域名查询失败：{e}")
+        return []
+    database = data.get("results", [])
+    size = data.get("size", 0)
+    # 合并查询的结果可能超过一页，翻页上限为[page]中end_page限制的页数乘以合并的目标数，与逐个查询时的额度一致
+    last_page = math.ceil(size / int(client.size))
+    end_page = config.get("page", "end_page")
+    if end_page != "auto":
+        last_page = min(last_page, (int(end_page) - 1) * targets)
+    for page in range(2, last_page + 1):
+        try:
+            data = client.get_data(query_str, page=page, fields=fields)
+        except RuntimeError as e:
+            print(Fore.RED + f"[!] 错误:域名查询第{page}页失败：{e}")
+            break
+        database = database + data.get("results", [])
+    if size > len(database):
+        print(Fore.YELLOW + f"[!] 域名查询结果共{size}条，受翻页限制只获取了{len(database)}条：{query_str[:100]}")
     return database
 
 
+# 把IP合并为 ip="a" || ip="b" 形式的查询语句，每条语句不超过长度和数量限制
+def batch_ip_query(ips, max_length, max_count):
+    queries = []
+    current = []
+    length = 0
+    for ip in sorted(ips):
+        condition = f'ip="{ip}"'
+        if current and (len(current) >= max_count or length + len(" || ") + len(condition) > max_length):
+            queries.append(" || ".join(current))
+            current = []
+            length = 0
+        length += len(condition) + (len(" || ") if current else 0)
+        current.append(condition)
+    if current:
+        queries.append(" || ".join(current))
+    return queries
+
+
 # 打印信息
-def print_domain():
+def print_domain(hosts):
     fields = 'ip,port,host,domain,icp,province,city'
     key_list = []
     pattern = "[a-zA-Z0-9][-a-zA-Z0-9]{0,62}(\.[a-zA-Z0-9][-a-zA-Z0-9]{0,62})+\.?"  # 匹配域名
-    with open("scan_result.txt", "r+", encoding="utf-8") as f:
-        data_lib = f.readlines()
-    for data in data_lib:
+    for data in hosts:
         key = re.search(pattern, data)
         if key:
             key_list.append(key.group())
     key_list = set(key_list)
-    database = []
+    ip_pattern = re.compile(r"(?<![\.\d])(?:\d{1,3}\.){3}\d{1,3}(?![\.\d])")
+    ips = [key for key in key_list if ip_pattern.search(key)]
+    # 没有域名的记录最终会被丢弃，合并的IP查询直接排除它们，节省翻页额度
+    queries = [f'({query}) && domain!=""' for query in
+               batch_ip_query(ips, config.getint("domain", "batch_max_length", fallback=1000),
+                              config.getint("domain", "batch_size", fallback=50))]
+    queries += [key for key in key_list if not ip_pattern.search(key)]
     print(Fore.RED + "======域名查询=======")
-    print(Fore.GREEN + f"[+] 本次待查询任务数为{len(key_list)}，预计耗时{len(key_list) * 1.5}s")
-    no = 1
-    for key in key_list:
-        if re.search(r"(?<![\.\d])(?:\d{1,3}\.){3}\d{1,3}(?![\.\d])", key):  # 匹配IP
-            query_str = f'ip="{key}"'
-        else:
-            query_str = f'{key}'
-        database = database + search_domain(query_str, fields, no)
-        no += 1
-        time.sleep(1.5)
-    set_database = []
+    print(Fore.GREEN + f"[+] 本次待查询目标数为{len(key_list)}，合并为{len(queries)}条查询语句并发查询")
+    database = []
+    for results in run_batch(queries, lambda query_str: search_domain(query_str, fields, query_str.count('ip="') or 1),
+                             "域名查询"):
+        if not isinstance(results, Exception):
+            database = database + results
+    set_database = dedupe(database, fields, dedup_keys)
     sheet_database = []
-    for data in database:
-        if data not in set_database:
-            set_database.append(data)
     id = 1
     field = fields.split(",")
     field.insert(0, 'ID')
@@ -105,29 +142,28 @@ def print_domain():
                    fields='id,ip,port,host,domain,icp,province,city,domain_screenshot')
 
 
-# 统计关键词出现频率
-def word_count(word, file):
-    a = file.split(word)
-    return len(a) - 1
+# nuclei扫描结果的严重程度对应的输出颜色
+def severity_color(severity):
+    return {"critical": Fore.LIGHTRED_EX, "high": Fore.LIGHTYELLOW_EX, "medium": Fore.LIGHTCYAN_EX,
+            "low": Fore.LIGHTGREEN_EX, "info": Fore.LIGHTBLUE_EX}.get(severity, Fore.WHITE)
+
+
+# 实时打印nuclei发现的漏洞
+def print_finding(record, counts):
+    severity = nuclei.severity(record)
+    target = record.get('matched-at') or record.get('host', '')
+    summary = " ".join(f"{s}:{counts[s]}" for s in nuclei.SEVERITIES[:5])
+    print(severity_color(severity) + f"[{severity}] [{record.get('template-id', '')}] {target}"
+          + Fore.GREEN + f"  ({summary})")
 
 
 # 输出nuclei扫描统计结果
-def result_count():
-    with open("scan_result.txt", "r", encoding="utf-8") as f:
-        file = f.readlines()
-    file = f"{file}"
-    critical = word_count("[critical]", file)
-    high = word_count("[high]", file)
-    medium = word_count("[medium]", file)
-    low = word_count("[low]", file)
-    info = word_count("[info]", file)
+def result_count(counts):
     print(Fore.RED + "======结果统计=======")
     print(Fore.GREEN + f"本次共计扫描{aim}个目标，发现目标的严重程度如下：")
-    print(Fore.LIGHTRED_EX + f"[+] [critical]:{critical}")
-    print(Fore.LIGHTYELLOW_EX + f"[+] [high]:{high}")
-    print(Fore.LIGHTCYAN_EX + f"[+] [medium]:{medium}")
-    print(Fore.LIGHTGREEN_EX + f"[+] [low:]{low}")
-    print(Fore.LIGHTBLUE_EX + f"[+] [info]:{info}")
+    for severity in nuclei.SEVERITIES:
+        if severity != "unknown" or counts[severity]:
+            print(severity_color(severity) + f"[+] [{severity}]:{counts[severity]}")
 
 
 # 手动更新nuclei
@@ -139,13 +175,20 @@ def nuclei_update():
     os.system(cmd)
 
 
-# 调用nuclie进行扫描
-def nuclie_scan(filename):
-    print(Fore.RED + "=====Nuclei扫描======")
-    scan = nuclei.Scan()
-    print(Fore.GREEN + "[+] 即将启动nuclei对目标进行扫描")
-    print(Fore.GREEN + f"[+] 扫描引擎路径[{scan.path}]")
-    filename = f"{filename}".split(".")[0] + ".txt"
+# nuclei速率、并发和超时参数，0表示使用nuclei默认值
+def nuclei_args(rate_limit, concurrency, timeout=0):
+    args = []
+    if rate_limit:
+        args.append(f"-rl {rate_limit}")
+    if concurrency:
+        args.append(f"-c {concurrency}")
+    if timeout:
+        args.append(f"-timeout {timeout}")
+    return " ".join(args)
+
+
+# 交互式选择nuclei扫描方式，返回生成单个分片扫描命令的函数
+def ask_scan_builder(scan, filename):
     print(
         Fore.GREEN + f"[-] nuclie默认使用全扫描，是否改用自定义扫描功能？[Y/N][温馨提示：若要修改扫描目标，可在此时手动修改{filename}文件内容]")
     switch = input()
@@ -168,23 +211,104 @@ def nuclie_scan(filename):
             print(
                 Fore.GREEN + "[-] 请输入完整的自定义命令内容[例如：-tags cve -severity critical,high -author geeknik]")
             customize_cmd = input()
-            cmd = scan.customize_cmd(filename, customize_cmd)
-            print(Fore.GREEN + f"[+] 本次扫描语句[{cmd}]")
+
+            def build_cmd(target, output):
+                return scan.customize_cmd(target, customize_cmd, output)
         else:
             print(Fore.GREEN + "[-] 请输入过滤器的内容[如：tech、cve、cms、fuzz、templates-path等]")
             value = input()
             print(Fore.GREEN + f"[+] 过滤器内容为[{value}]")
-            cmd = scan.keyword_multi_target(filename, mode_v, value)
-            print(Fore.GREEN + f"[+] 本次扫描语句[{cmd}]")
+
+            def build_cmd(target, output):
+                return scan.keyword_multi_target(target, mode_v, value, output)
     else:
         print(Fore.GREEN + "[+] 正在调用nuclei对目标进行全扫描")
-        cmd = scan.multi_target(filename)
-        print(Fore.GREEN + f"[+] 本次扫描语句：{cmd}")
-    time.sleep(1)
-    os.system(cmd)
-    print(Fore.GREEN + "[+]扫描完成，扫描结果保存为：scan_result.txt")
-    result_count()  # 统计扫描结果
-    print_domain()  # 查找拥有域名的IP
+        build_cmd = scan.multi_target
+    return build_cmd
+
+
+# 根据fofa.ini中的[profile:名称]配置生成扫描命令，无需交互
+def profile_scan_builder(scan, profile):
+    mode = profile.get("mode", "full")
+    value = profile.get("value", "")
+    print(Fore.GREEN + f"[+] 扫描配置：mode={mode} value={value}")
+    if mode == "full":
+        return scan.multi_target
+    if mode == "customize":
+        return lambda target, output: scan.customize_cmd(target, value, output)
+    if mode in ("tags", "severity", "author", "templates"):
+        return lambda target, output: scan.keyword_multi_target(target, mode, value, output)
+    print(Fore.RED + f"[!] 错误:扫描配置中的mode不支持[{mode}]，可选full、tags、severity、author、templates、customize")
+    sys.exit(1)
+
+
+# 读取扫描配置，未指定配置时使用[nuclei]中的默认值
+def scan_profile(name):
+    settings = dict(config["nuclei"]) if config.has_section("nuclei") else {}
+    if name:
+        section = f"profile:{name}"
+        if not config.has_section(section):
+            profiles = [s.split(":", 1)[1] for s in config.sections() if s.startswith("profile:")]
+            print(Fore.RED + f"[!] 错误:未找到扫描配置[{name}]，可用的配置：{'、'.join(profiles) or '无'}")
+            sys.exit(1)
+        settings.update(config[section])
+    return settings
+
+
+# 调用nuclie进行扫描
+def nuclie_scan(filename, profile_name=None):
+    print(Fore.RED + "=====Nuclei扫描======")
+    scan = nuclei.Scan()
+    print(Fore.GREEN + "[+] 即将启动nuclei对目标进行扫描")
+    print(Fore.GREEN + f"[+] 扫描引擎路径[{scan.path}]")
+    filename = f"{filename}".split(".")[0] + ".txt"
+    if asset_store is not None:
+        filename = diff_targets(filename)
+        if filename is None:
+            print(Fore.GREEN + "[+] 增量模式：没有新增或变化的扫描目标，跳过本次扫描")
+            return
+    profile = scan_profile(profile_name)
+    if profile_name:
+        print(Fore.GREEN + f"[+] 使用扫描配置[{profile_name}]")
+        build_cmd = profile_scan_builder(scan, profile)
+    else:
+        build_cmd = ask_scan_builder(scan, filename)
+    # 目标文件拆分为多个分片，由多个nuclei进程并行扫描，结果边扫描边合并去重、边写入Excel
+    shards = int(profile.get("shards", 4))
+    extra_args = nuclei_args(int(profile.get("rate_limit", 0)), int(profile.get("concurrency", 0)),
+                             int(profile.get("timeout", 0)))
+    runner = nuclei.ShardedRunner(build_cmd, filename, shards=shards, extra_args=extra_args,
+                                  max_attempts=int(profile.get("max_attempts", 2)),
+                                  on_finding=print_finding)
+    cmd = f"{build_cmd(filename, 'scan_result.jsonl')} {extra_args}".strip()
+    print(Fore.GREEN + f"[+] 本次扫描语句[{cmd}]")
+    print(Fore.GREEN + f"[+] 目标将拆分为最多{shards}个分片并行扫描")
+    rows = (nuclei.finding_row(record) for record in runner.findings())
+    exporter.write_excel("scan_result.xlsx", {"nuclei": rows}, nuclei.FINDING_FIELDS, add_id=True)
+    for shard_file, error in runner.failed:
+        print(Fore.RED + f"[!] 错误:分片{shard_file}多次扫描失败（{error}），其结果可能不完整")
+    print(Fore.GREEN + "[+]扫描完成，扫描结果保存为：scan_result.jsonl、scan_result.xlsx")
+    result_count(runner.counts)  # 统计扫描结果
+    print_domain(runner.hosts)  # 查找拥有域名的IP
+    # 增量模式下记录本次已扫描的目标，分片失败时不记录以便下次重新扫描
+    if asset_store is not None and not runner.failed:
+        with open(filename, "r", encoding="utf-8") as f:
+            asset_store.mark({asset_key(line.strip()) for line in f if line.strip()}, "scan")
+
+
+# 增量模式：从扫描目标中挑出上次扫描后新增或变化的资产，写入单独的目标文件
+def diff_targets(filename):
+    with open(filename, "r", encoding="utf-8") as f:
+        targets = [line.strip() for line in f if line.strip()]
+    pending = asset_store.pending({asset_key(target) for target in targets}, "scan")
+    targets = [target for target in targets if asset_key(target) in pending]
+    print(Fore.GREEN + f"[+] 增量模式：{len(pending)}个目标自上次扫描后新增或变化，其余已跳过")
+    if not targets:
+        return None
+    diff_file = f"{filename}".rsplit(".", 1)[0] + "-diff.txt"
+    with open(diff_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(targets) + "\n")
+    return diff_file
 
 
 # 过滤输出文件名中包含的特殊字符
@@ -197,11 +321,10 @@ def clean_filename(filename, replace='_'):
 
 # 输出扫描目标
 def out_file_scan(filename, database):
-    scan_list = []
-    for target in database:
-        if "http" in target[1]:
-            scan_list.append(f"{protocols[target[1]]}{target[0]}\n")
-    scan_list = set(scan_list)
+    if isinstance(database, dict):
+        database = ResultSet.concat(list(database.values()))
+    is_web, urls = http_handle(database)
+    scan_list = set(urls[is_web] + "\n")
     print(Fore.GREEN + "[+] 已自动对结果做去重处理")
     filename = f"{filename}".split(".")[0] + ".txt"
     with open(filename, "w+", encoding="utf-8") as f:
@@ -226,76 +349,30 @@ def out_file_excel(filename, database, scan_format, fields, options=None):
         field = fields.split(",")  # 获取查询参数
         if options == "add_id":
             field.insert(0, "id")
-        column_lib = {1: 'A', 2: 'B', 3: 'C', 4: 'D', 5: 'E', 6: 'F', 7: 'G', 8: 'H', 9: 'I', 10: 'J', 11: 'K', 12: 'L',
-                      13: 'M', 14: 'N', 15: 'O', 16: 'P', 17: 'Q', 18: 'R', 19: 'S', 20: 'T', 21: 'U', 22: 'V', 23: 'W',
-                      24: 'X', 25: 'Y', 26: 'Z'}
-        with xlsxwriter.Workbook(filename) as workbook:
-            if sheet_merge == "on" and type(database) == dict:
-                for key in database.keys():
-                    cleaned_name = re.sub(r'[\[\]:*?/\\]', '_', key[:31])
-                    worksheet = workbook.add_worksheet(cleaned_name)
-                    worksheet.set_column(f'A:{column_lib[len(field)]}', 30)
-                    title_format = workbook.add_format(
-                        {'font_size': 14, 'border': 1, 'bold': True, 'font_color': 'white', 'bg_color': '#4BACC6',
-                         'align': 'center',
-                         'valign': 'center', 'text_wrap': True})
-                    content_format = workbook.add_format(
-                        {'border': 1, 'align': 'center', 'valign': 'vcenter', 'text_wrap': True})
-                    i = 1
-                    row = 1
-                    col = 0
-                    for column in field:
-                        worksheet.write(f'{column_lib[i]}1', column, title_format)
-                        i += 1
-                    for item in database[key]:
-                        for n in range(len(field)):
-                            if "规则不存在" in item:
-                                error = "".join(item[1:])
-                                worksheet.write(row, col + n, error, content_format)
-                            else:
-                                worksheet.write(row, col + n, item[n], content_format)
-                        row = row + 1
-            else:
-                worksheet = workbook.add_worksheet()
-                worksheet.set_column(f'A:{column_lib[len(field)]}', 30)
-                title_format = workbook.add_format(
-                    {'font_size': 14, 'border': 1, 'bold': True, 'font_color': 'white', 'bg_color': '#4BACC6',
-                     'align': 'center',
-                     'valign': 'center', 'text_wrap': True})
-                content_format = workbook.add_format(
-                    {'border': 1, 'align': 'center', 'valign': 'vcenter', 'text_wrap': True})
-                i = 1
-                row = 1
-                col = 0
-                for column in field:
-                    worksheet.write(f'{column_lib[i]}1', column, title_format)
-                    i += 1
-                if options == "add_id":
-                    id = 1
-                    for item in database:
-                        for n in range(len(field)):
-                            if n == 0:
-                                worksheet.write(row, col + n, id, content_format)
-                            else:
-                                if "规则不存在" in item:
-                                    error = "".join(item[1:])
-                                    worksheet.write(row, col + n, error, content_format)
-                                else:
-                                    worksheet.write(row, col + n, item[n - 1], content_format)
-                        id += 1
-                        row = row + 1
-                else:
-                    for item in database:
-                        for n in range(len(field)):
-                            if "规则不存在" in item:
-                                error = "".join(item[1:])
-                                worksheet.write(row, col + n, error, content_format)
-                            else:
-                                worksheet.write(row, col + n, item[n], content_format)
-                        row = row + 1
+        if sheet_merge == "on" and type(database) == dict:
+            sheets = database
+        else:
+            sheets = {None: database}
+        # 大结果集可在fofa.ini中改为csv/parquet格式输出，xlsx也以流式方式写入，内存占用与行数无关
+        export_format = config.get("excel", "format", fallback="xlsx")
+        try:
+            files = exporter.WRITERS.get(export_format, exporter.write_excel)(
+                filename, sheets, field, add_id=options == "add_id")
+        except ImportError as e:
+            print(Fore.RED + f"[!] 错误:{export_format}格式输出需要安装pyarrow（{e}），已改为csv格式输出")
+            files = exporter.write_csv(filename, sheets, field, add_id=options == "add_id")
+        filename = "、".join(files)
         print(Fore.GREEN + f"[+] 文档输出成功！文件名为：{filename}")
 
 
+# 打印查询缓存命中情况
+def print_cache_stats():
+    cache = client.cache
+    if cache is None or cache.hits + cache.misses == 0:
+        return
+    print(Fore.GREEN + f"[+] 查询缓存：命中{cache.hits}次，未命中{cache.misses}次，命中率{cache.hit_rate():.1%}")
+
+
 # 获取用户信息
 def get_userinfo():
     user_info = client.get_userinfo()
@@ -313,9 +390,9 @@ def get_userinfo():
 
 
 # 调用fofa_api进行搜索
-def get_search(query_str, scan_format):
+def get_search(query_str, scan_format, verbose=True):
     start_page = config.getint("page", "start_page")
-    end_page = config.getint("page", "end_page")
+    end_page = config.get("page", "end_page")
     if scan_format:
         fields = "host,protocol"  # 获取查询参数
     else:
@@ -333,66 +410,150 @@ def get_search(query_str, scan_format):
                 temp = fields.split(",")
                 temp.remove("host")
                 fields = "host," + ",".join(temp)
-    print(Fore.RED + "======查询内容=======")
-    print(Fore.GREEN + f"[+] 查询语句：{query_str}")
-    print(Fore.GREEN + f"[+] 查询参数：{fields}")
-    print(Fore.GREEN + f"[+] 查询页数：{start_page}-{end_page}")
-    database = []
-    for page in range(start_page, end_page):  # 从第1页查到第n页
-        try:
-            data = client.get_data(query_str, page=page, fields=fields)  # 查询第page页数据
-        except Exception as e:
-            fields = "Error"
-            data = {"results": [f"{e}"]}
-        database = database + data["results"]
-        time.sleep(0.1)
-    set_database = []
-    for data in database:
-        if data not in set_database:
-            set_database.append(data)
+    if verbose:
+        print(Fore.RED + "======查询内容=======")
+        print(Fore.GREEN + f"[+] 查询语句：{query_str}")
+        print(Fore.GREEN + f"[+] 查询参数：{fields}")
+        print(Fore.GREEN + f"[+] 查询页数：{start_page}-{end_page}")
+    try:
+        data = client.get_data(query_str, page=start_page, fields=fields)  # 第一页同时返回结果总数
+    except Exception as e:
+        return ResultSet.from_rows([f"{e}"], "Error"), "Error"
+    database = data["results"]
+    # 根据结果总数计算最后一页，其余页面并发查询
+    last_page = max(start_page, math.ceil(data.get("size", 0) / int(client.size)))
+    if end_page != "auto":
+        last_page = min(last_page, int(end_page) - 1)
+    pages = list(range(start_page + 1, last_page + 1))
+    if pages:
+        if verbose:
+            print(Fore.GREEN + f"[+] 结果总数：{data.get('size', 0)}，共{last_page - start_page + 1}页，正在并发查询剩余页面")
+
+        def get_page(page):
+            try:
+                return client.get_data(query_str, page=page, fields=fields)["results"]  # 查询第page页数据
+            except Exception as e:
+                print(Fore.RED + f"[!] 错误:第{page}页查询失败：{e}")
+                return []
+
+        with ThreadPoolExecutor(max_workers=config.getint("concurrency", "workers", fallback=4)) as executor:
+            for results in executor.map(get_page, pages):
+                database.extend(results)
+    set_database = ResultSet.from_rows(database, fields).dedupe(dedup_keys)
+    # 增量模式下完整结果照常输出，资产库只记录变化，由nuclei扫描和网站分析各自挑选未处理过的资产
+    changed = record_assets(set_database) if asset_store is not None else set()
     if check_alive == "on" and fields != "Error" and scan_format is not True:
-        fields = fields + ",HTTP Status Code"
-        set_database = check_is_alive(set_database)
+        set_database = check_is_alive(set_database, changed)
+        fields = ",".join(set_database.fields)
+    if asset_store is not None and verbose:
+        print(Fore.GREEN + f"[+] 增量模式：共{len(set_database)}个资产，本次新增或变化{len(changed)}个")
     return set_database, fields
 
 
-# 判定目标是否开启http协议
-def http_handle(target):
-    if "http" in target[1]:
-        target = f"{protocols[target[1]]}{target[0]}"
-        return target
-    return False
+# 结果中每一行对应的资产键(host:port)
+def asset_keys(database):
+    columns = database.fields
+    hosts = database.column("host") if "host" in columns else [""] * len(database)
+    protos = database.column("protocol") if "protocol" in columns else [""] * len(database)
+    ports = database.column("port") if "port" in columns else [""] * len(database)
+    return pd.Series([asset_key(h, p, o) for h, p, o in zip(hosts, protos, ports)], dtype=object)
+
+
+# 增量模式：在资产库中记录本次查询到的资产，返回新出现或FOFA数据有变化的资产键
+def record_assets(set_database):
+    if "host" not in set_database.fields or not len(set_database):
+        return set()
+    fields = set_database.fields
+    return asset_store.observe(zip(asset_keys(set_database), (row_fingerprint(fields, row) for row in set_database)))
+
+
+# 判定目标是否开启http协议，返回是否为web服务的掩码和对应的url列
+def http_handle(database):
+    if "protocol" not in database.fields or "host" not in database.fields:
+        empty = pd.Series([], dtype=object)
+        return empty.astype(bool), empty
+    protocol = database.column("protocol").astype(str)
+    is_web = protocol.str.contains("http", regex=False)
+    urls = protocol.map(lambda p: protocols.get(p, "")) + database.column("host").astype(str)
+    return is_web, urls
+
+
+# 存活检测probe记录的附加信息及其在结果中的列名
+PROBE_COLUMNS = [("Web Title", "title"), ("Server", "server"), ("Content Length", "content_length"),
+                 ("Body Hash", "body_hash"), ("Redirects", "redirects"), ("TLS Subject", "tls_subject"),
+                 ("TLS SAN", "tls_san")]
+
+
+def probe_value(probe, key):
+    if probe is None:
+        return ""
+    value = probe.get(key, "")
+    return " -> ".join(value) if isinstance(value, list) else value
 
 
 # 网站存活检测
-def check_is_alive(set_database):
-    check_list = []
-    for target in set_database:
-        if "http" in target[1]:
-            check_list.append(f"{protocols[target[1]]}{target[0]}")
-    check_list = set(check_list)
+def check_is_alive(set_database, changed=None):
+    is_web, urls = http_handle(set_database)
+    # 开启probe后在同一次请求中记录标题、Server、响应体哈希、跳转链和证书信息，并保存页面供网站分析复用
+    rich = config.get("fast_check", "probe", fallback="off") == "on"
+    keys = asset_keys(set_database)
+    # 增量模式未开启probe时只检测新增或变化的资产，其余沿用资产库中上次的检测结果；
+    # 开启probe时仍需全部检测，用响应体哈希发现FOFA数据未变但页面变化的资产
+    skip = pd.Series(False, index=urls.index)
+    if asset_store is not None and changed is not None and not rich:
+        skip = is_web & ~keys.isin(changed)
+    check_list = set(urls[is_web & ~skip])
     time_out = config.getint("fast_check", "timeout")
+    total = len(check_list)
+    checked = [0, 0]
+
+    # 检测结果边完成边统计，大量目标时定期打印进度
+    def on_result(url, status):
+        checked[0] += 1
+        checked[1] += status == "200"
+        if checked[0] % 1000 == 0 or checked[0] == total:
+            print(Fore.GREEN + f"[+] 存活检测进度：{checked[0]}/{total}，存活{checked[1]}个")
+
+    store = ProbeStore(config.get("fast_check", "probe_store", fallback=os.path.join('output', 'probe_store.sqlite')),
+                       ttl=config.getfloat("fast_check", "probe_store_hours", fallback=24) * 3600) if rich else None
     try:
-        ff = FastCheck(check_list, timeout=time_out)
+        ff = FastCheck(check_list, timeout=time_out,
+                       concurrency=config.getint("fast_check", "concurrency", fallback=200),
+                       per_host=config.getint("fast_check", "per_host", fallback=10),
+                       dns_ttl=config.getint("fast_check", "dns_cache_ttl", fallback=300),
+                       on_result=on_result, rich=rich, store=store,
+                       max_body=config.getint("fast_check", "probe_max_body_kb", fallback=1024) * 1024)
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         loop.run_until_complete(ff.check_urls())
+        loop.close()
     except Exception as e:
         print(Fore.RED + "[!] 错误:网络存活性检测功能出错啦，请重新尝试！")
         exit(0)
-    for target in set_database:
-        if http_handle(target) is not False:
-            target.append(ff.result_dict[http_handle(target)])
-            target[0] = http_handle(target)
-        else:
-            target.append("Not a web service")
+    finally:
+        if store is not None:
+            store.close()
+    status = urls.map(lambda url: ff.result_dict.get(url, "")).where(is_web, "Not a web service")
+    if asset_store is not None:
+        if skip.any():
+            last = asset_store.statuses(keys[skip])
+            status = status.where(~skip, keys.map(lambda key: last.get(key, "")))
+            print(Fore.GREEN + f"[+] 增量模式：{int(skip.sum())}个未变化资产跳过存活检测，沿用上次结果")
+        asset_store.update_statuses(zip(keys[is_web & ~skip], status[is_web & ~skip]))
+    set_database = set_database.with_column("host", urls.where(is_web, set_database.column("host")))
+    set_database = set_database.with_column("HTTP Status Code", status)
+    if rich:
+        for column, key in PROBE_COLUMNS:
+            values = urls.map(lambda url: probe_value(ff.probe_dict.get(url), key))
+            set_database = set_database.with_column(column, values.where(is_web, ""))
+        # 存活检测同时作为增量模式的廉价探测：FOFA数据未变但页面内容变化的资产也会被标记为变化
+        if asset_store is not None:
+            body_changed = asset_store.update_body_hashes(zip(keys, set_database.column("Body Hash")))
+            if changed is not None:
+                changed |= body_changed
     del ff
     if include:
-        f_set_database = []
-        for data in set_database:
-            if data[-1] in include.split(","):
-                f_set_database.append(data)
-        return f_set_database
+        return set_database.filter(status.astype(str).isin(include.split(",")))
     else:
         return set_database
 
@@ -404,15 +565,10 @@ def print_result(database, fields, scan_format):
     else:
         print(Fore.RED + "======查询结果=======")
     if scan_format:
-        scan_list = []
-        for target in database:
-            if "http" in target[1]:
-                scan_list.append(Fore.GREEN + f"{protocols[target[1]]}{target[0]}")
-        scan_list = set(scan_list)
-        for value in scan_list:
-            print(value)
+        is_web, urls = http_handle(database)
+        for value in set(urls[is_web]):
+            print(Fore.GREEN + value)
     else:
-        id = 1
         field = fields.split(",")
         field.insert(0, 'ID')
         table = PrettyTable(field)
@@ -420,34 +576,74 @@ def print_result(database, fields, scan_format):
         table.header_style = "title"
         table.align = "c"
         table.valign = "m"
-        for item in database:
-            if type(item) == str:
-                item = [item]
-            if "title" in fields:
-                title = f"{item[field.index('title') - 1]}".strip()
-                if len(title) > 20:
-                    title = title[:20] + "......"
-                item[field.index("title") - 1] = title
-            item.insert(0, id)
-            table.add_row(item)
-            id += 1
+        if "title" in database.fields:
+            title = database.column("title").astype(str).str.strip()
+            title = title.where(title.str.len() <= 20, title.str[:20] + "......")
+            database = database.with_column("title", title)
+        for id, item in enumerate(database, 1):
+            table.add_row([id, *item])
         print(Fore.GREEN + f'{table}')  # 打印查询表格
 
 
+# 并发执行批量任务，按任务顺序返回结果
+def run_batch(tasks, func, label):
+    workers = config.getint("concurrency", "workers", fallback=4)
+    retries = config.getint("concurrency", "retries", fallback=2)
+    total = len(tasks)
+    done = [0]
+    lock = threading.Lock()
+
+    def run(n, task):
+        for attempt in range(retries + 1):
+            try:
+                return func(task)
+            except Exception as e:
+                if attempt == retries:
+                    print(Fore.RED + f"[!] 错误:{label}task-{n}失败：{e}")
+                    return e
+                print(Fore.YELLOW + f"[!] {label}task-{n}失败，正在重试({attempt + 1}/{retries})：{e}")
+                time.sleep(2 ** attempt)
+
+    def progress(future):
+        with lock:
+            done[0] += 1
+            print(Fore.GREEN + f"[+] {label}进度：{done[0]}/{total}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for n, task in enumerate(tasks, 1):
+            future = executor.submit(run, n, task)
+            future.add_done_callback(progress)
+            futures.append(future)
+        for future in futures:
+            yield future.result()
+
+
 # 批量查询
 def bat_query(bat_query_file, scan_format):
     with open(bat_query_file, "r+", encoding="utf-8") as f:
-        bat_str = f.readlines()
+        bat_str = [line.strip() for line in f if line.strip()]
     id = 1
     total = len(bat_str)
     sheet_merge_data = {}
-    for query_str in bat_str:
-        print(Fore.RED + "======批量查询=======")
-        print(Fore.GREEN + f"[+] 任务文件：{bat_query_file}")
-        print(Fore.GREEN + f"[+] 任务总数：{total}")
-        print(Fore.GREEN + f"[+] 当前任务：task-{id}")
-        query_str = query_str.strip()
-        database, fields = get_search(query_str, scan_format)
+    fields = None
+    print(Fore.RED + "======批量查询=======")
+    print(Fore.GREEN + f"[+] 任务文件：{bat_query_file}")
+    print(Fore.GREEN + f"[+] 任务总数：{total}")
+
+    def search(query_str):
+        database, fields = get_search(query_str, scan_format, verbose=False)
+        if fields == "Error":
+            raise RuntimeError(database[0])
+        return database, fields
+
+    for query_str, result in zip(bat_str, run_batch(bat_str, search, "批量查询")):
+        print(Fore.RED + f"======任务-{id}=======")
+        print(Fore.GREEN + f"[+] 查询语句：{query_str}")
+        if isinstance(result, Exception):
+            database, fields = ResultSet.from_rows([f"{result}"], "Error"), "Error"
+        else:
+            database, fields = result
         if key_word:
             match_key_word(database)
         # 输出excel文档
@@ -491,11 +687,12 @@ def get_icon_hash(ico):
 
 
 # host聚合查询
-def host_merge(query_host, email, key, filename="host聚合查询结果.xlsx", sheet_merge_data=None):
+def host_merge(query_host, filename="host聚合查询结果.xlsx", sheet_merge_data=None, data=None):
     try:
-        url = f"https://fofa.info/api/v1/host/{query_host}?detail=true&email={email}&key={key}"
-        res = requests.get(url, timeout=30)
-        data = res.json()
+        if data is None:
+            data = client.get_host(query_host)
+        elif isinstance(data, Exception):
+            raise data
         print(Fore.GREEN + f"[+] 主机名:{data['host']}")
         print(Fore.GREEN + f"[+] IP地址:{data['ip']}")
         print(Fore.GREEN + f"[+] asn编号:{data['asn']}")
@@ -514,12 +711,9 @@ def host_merge(query_host, email, key, filename="host聚合查询结果.xlsx", s
 
 
 # 统计聚合查询
-def count_merge(fields, count_query, email, key):
+def count_merge(fields, count_query):
     try:
-        qbase64 = base64.b64encode(bytes(count_query.encode('utf-8'))).decode()
-        url = f"https://fofa.info/api/v1/search/stats?fields={fields}&qbase64={qbase64}&email={email}&key={key}"
-        res = requests.get(url, timeout=30)
-        data = res.json()
+        data = client.get_stats(count_query, fields)
         if data['error']:
             print(Fore.RED + f"[!] 错误:{data['errmsg']}")
         else:
@@ -585,24 +779,22 @@ def print_table_detail(type, data):
 #  批量host聚合查询
 def bat_host_query(bat_host_file):
     with open(bat_host_file, "r+", encoding="utf-8") as f:
-        bat_host = f.readlines()
+        bat_host = [line.strip() for line in f if line.strip()]
     id = 1
     total = len(bat_host)
     sheet_merge_data = {}
     print(Fore.RED + "====批量Host查询=====")
     print(Fore.GREEN + f"[+] 任务文件：{bat_host_file}")
     print(Fore.GREEN + f"[+] 任务总数：{total}")
-    for query_host in bat_host:
+    # 查询并发进行（由客户端统一限速），结果按任务顺序输出
+    for query_host, data in zip(bat_host, run_batch(bat_host, client.get_host, "批量Host查询")):
         print(Fore.RED + f"=======任务-{id}========")
-        query_host = query_host.strip()
         if sheet_merge == "on":
-            host_merge(query_host, client.email, client.key,
-                       sheet_merge_data=sheet_merge_data)
+            host_merge(query_host, sheet_merge_data=sheet_merge_data, data=data)
         else:
-            host_merge(query_host, client.email, client.key,
-                       filename=f"host聚合查询_任务-{id}-【{query_host}】-{int(time.time())}.xlsx")
+            host_merge(query_host, filename=f"host聚合查询_任务-{id}-【{query_host}】-{int(time.time())}.xlsx",
+                       data=data)
         id += 1
-        time.sleep(1)
     if sheet_merge == "on":
         filename = f"批量host聚合查询-{int(time.time())}.xlsx"
         out_file_excel(filename, sheet_merge_data, scan_format=None, fields="id,port,protocol,products,update_time")
@@ -610,28 +802,25 @@ def bat_host_query(bat_host_file):
 
 # 筛选关键字
 def match_key_word(database):
-    k = 0
-    pattern = f"{key_word}".replace(",", "|")
-    for data in database:
-        for item in data:
-            regular = re.compile(pattern, re.I)
-            m = re.search(regular, item)
-            if m is not None:
-                k += 1
-        if k >= 1:
-            key_database.append(data.copy())
-            k = 0
+    global keyword_filter
+    if keyword_filter is None:
+        keyword_filter = KeywordFilter(key_word)
+    key_database.append(keyword_filter.match(database))
 
 
 # 输出关键词匹配结果
 def out_key_word(scan_format, fields):
     print(Fore.RED + "=====关键字筛选======")
     print(Fore.GREEN + f"[+] 关键字：{key_word}")
-    print(Fore.GREEN + f"[+] 本次共计筛选处包含关键字的信息：{len(key_database)}条")
-    if len(key_database) > 0:
-        out_file_excel(f"关键词匹配查询结果-{int(time.time())}.xlsx", key_database, scan_format, fields,
+    matched = ResultSet.concat(key_database)
+    print(Fore.GREEN + f"[+] 本次共计筛选处包含关键字的信息：{len(matched)}条")
+    if keyword_filter is not None:
+        for keyword, count in keyword_filter.counts.items():
+            print(Fore.GREEN + f"[+] 关键字【{keyword}】命中：{count}条")
+    if len(matched) > 0:
+        out_file_excel(f"关键词匹配查询结果-{int(time.time())}.xlsx", matched, scan_format, fields,
                        options="add_id")
-        print_result(key_database, fields, scan_format)
+        print_result(matched, fields, scan_format)
 
 
 # 日志功能
@@ -661,6 +850,7 @@ if __name__ == '__main__':
     protocols = {"http": HTTP_PREFIX, "https": "", "kubernetes(https)": HTTPS_PREFIX, "kubernetes(http)": HTTP_PREFIX,
                  "nacos(https)": HTTPS_PREFIX, "nacos(http)": HTTP_PREFIX, "prometheus(http)": HTTP_PREFIX, "clickHouse(http)": HTTP_PREFIX}
     key_database = []
+    keyword_filter = None
     colorama.init(autoreset=True)
     Fore = colorama.Fore
     config = configparser.ConfigParser()
@@ -670,6 +860,7 @@ if __name__ == '__main__':
     full_sw = config.get("full", "full")
     check_alive = config.get("fast_check", "check_alive")
     sheet_merge = config.get("excel", "sheet_merge")
+    dedup_keys = parse_key_fields(config.get("dedup", "key_fields", fallback=""))
     parser = argparse.ArgumentParser(
         description="SearchMap (A fofa API information collection tool)")
     parser.add_argument('-q', '--query', help='Fofa Query Statement')
@@ -685,6 +876,11 @@ if __name__ == '__main__':
     parser.add_argument('-o', '--outfile', default="fofa查询结果.xlsx", help='File Save Name')
     parser.add_argument('-n', '--nuclie', help='Use Nuclie To Scan Targets', action='store_true')
     parser.add_argument('-up', '--update', help='OneKey Update Nuclie-engine And Nuclei-templates', action='store_true')
+    parser.add_argument('-p', '--profile', help='Run Nuclie With A [profile:NAME] Section Of fofa.ini Instead Of Prompting')
+    parser.add_argument('--cache-ttl', type=float, help='Reuse cached Fofa API results younger than this many hours')
+    parser.add_argument('--no-cache', help='Do not read or write the local Fofa query cache', action='store_true')
+    parser.add_argument('--diff', help='Only Scan And Analyze Assets That Are New Or Changed Since The Last Run',
+                        action='store_true')
     
     # 添加combined_script.py的命令行参数
     ip_tools_parser = parser.add_argument_group('IP Tools Options')
@@ -700,6 +896,8 @@ if __name__ == '__main__':
     parser.add_argument('--analyze', help='Run website analysis', action='store_true')
     parser.add_argument('--target_company', help='Target company name to check for')
     parser.add_argument('--model', help='OpenAI model to use for analysis')
+    parser.add_argument('--batch_size', type=int, help='Number of hosts classified per LLM request (1 disables batching)')
+    parser.add_argument('--resume', help='Resume an interrupted website analysis from its output directory')
     
     args = parser.parse_args()
     query_str = args.query
@@ -737,18 +935,31 @@ if __name__ == '__main__':
     
     # 获取版本信息
     banner()
+    # 扫描配置可同时覆盖存活检测超时和FOFA查询速率，便于无人值守运行
+    profile = scan_profile(args.profile) if args.profile else {}
+    if "check_timeout" in profile:
+        config.set("fast_check", "timeout", profile["check_timeout"])
     # 生成一个fofa客户端实例
-    client = fofa.Client()
+    client = fofa.Client(use_cache=False if args.no_cache else None, cache_ttl=args.cache_ttl)
+    if "fofa_rate" in profile:
+        client.limiter = fofa.RateLimiter(float(profile["fofa_rate"]))
+    atexit.register(print_cache_stats)
+    # 增量模式：资产库记录每个host:port的首次/最近发现时间、响应体哈希和上次扫描时间
+    asset_store = AssetStore(config.get("diff", "store", fallback=os.path.join('output', 'asset_store.sqlite'))) \
+        if args.diff else None
+    if asset_store is not None:
+        print(Fore.GREEN + "[*]增量模式:开启，仅处理新增或变化的资产")
+        atexit.register(asset_store.close)
     # 获取账号信息
     get_userinfo()
     
     # 处理原有功能
     if query_host:
         print(Fore.RED + "======Host聚合=======")
-        host_merge(query_host, client.email, client.key)
+        host_merge(query_host)
     if count_query:
         print(Fore.RED + "======统计聚合=======")
-        count_merge(query_fields, count_query, client.email, client.key)
+        count_merge(query_fields, count_query)
     if bat_host_file:
         bat_host_query(bat_host_file)
     if query_str or bat_query_file or ico:
@@ -770,7 +981,7 @@ if __name__ == '__main__':
             if key_word:
                 out_key_word(scan_format, fields)
         if scan_format and is_scan:
-            nuclie_scan(filename)
+            nuclie_scan(filename, args.profile)
         sys.exit()
     if update:
         nuclei_update()
@@ -829,27 +1040,46 @@ if __name__ == '__main__':
             print(Fore.RED + "[!] 错误: website_analyzer模块未成功导入，无法执行此功能")
             sys.exit(1)
             
-        if not (args.outfile and args.target_company):
+        excel_file = args.outfile
+        target_company = args.target_company
+        if args.resume:
+            # 断点续跑：沿用上次运行的输出目录和参数
+            try:
+                run = website_analyzer.WebsiteAnalyzer.load_run(args.resume)
+            except (OSError, ValueError) as e:
+                print(Fore.RED + f"[!] 错误: 无法读取{args.resume}中的运行记录: {e}")
+                sys.exit(1)
+            excel_file = run["excel_file"] if args.outfile == parser.get_default("outfile") else args.outfile
+            target_company = target_company or run["target_company"]
+        
+        if not (excel_file and target_company):
             print(Fore.RED + "[!] 错误: 使用--analyze需要同时指定--outfile (用于Excel文件路径)和--target_company参数")
             sys.exit(1)
         
         print(Fore.RED + "=====网站分析处理=====")
-        print(Fore.GREEN + f"[+] Excel文件路径: {args.outfile}")
-        print(Fore.GREEN + f"[+] 目标公司: {args.target_company}")
+        print(Fore.GREEN + f"[+] Excel文件路径: {excel_file}")
+        print(Fore.GREEN + f"[+] 目标公司: {target_company}")
         
         if args.model:
             print(Fore.GREEN + f"[+] 使用模型: {args.model}")
         
-        # 创建输出目录
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        output_dir = os.path.join('output', f'analysis_{timestamp}')
+        if args.resume:
+            output_dir = args.resume
+            print(Fore.GREEN + f"[+] 从检查点恢复: {output_dir}")
+        else:
+            # 创建输出目录
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            output_dir = os.path.join('output', f'analysis_{timestamp}')
         
         analyzer = website_analyzer.WebsiteAnalyzer(output_dir=output_dir)
         if args.model:
             analyzer.model = args.model
+        if args.batch_size:
+            analyzer.llm_batch_size = args.batch_size
+            print(Fore.GREEN + f"[+] 批量分析: 每次请求{args.batch_size}个目标")
         
         try:
-            analyzer.run_analysis(args.outfile, args.target_company)
+            analyzer.run_analysis(excel_file, target_company, resume=bool(args.resume), diff=args.diff)
             print(Fore.GREEN + f"[+] 网站分析成功完成，结果保存在: {output_dir}")
         except Exception as e:
             print(Fore.RED + f"[!] 网站分析处理失败: {e}")
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 各处理阶段在资产表中对应的时间列
+STAGES = {"scan": "last_scan", "analyze": "last_analyzed"}
+
+
+def asset_key(host, protocol="", port=""):
+    """Normalise a FOFA host (with or without scheme/port) into a 'host:port' key"""
+    host = f"{host or ''}".strip()
+    scheme = ""
+    if "://" in host:
+        scheme, host = host.split("://", 1)
+    host = host.split("/", 1)[0].lower()
+    if host.rsplit(":", 1)[-1].isdigit() and not host.endswith("]"):
+        return host
+    if not port:
+        secure = "https" in f"{scheme or protocol}".lower()
+        port = 443 if secure else 80
+    return f"{host}:{port}"
+
+
+# 参与指纹计算的FOFA字段；lastupdatetime等每次都会变化的字段和存活检测附加的列不参与
+FINGERPRINT_FIELDS = ("protocol", "ip", "port", "domain", "title", "server", "banner", "header", "cert", "icp",
+                      "product", "version")
+
+
+def row_fingerprint(fields, row):
+    """Fingerprint of the FINGERPRINT_FIELDS present in a FOFA row, prefixed with the names of those fields.
+
+    Queries with different field lists (e.g. -s versus the full fields) produce
+    fingerprints with different prefixes, which ``AssetStore.observe`` does not
+    count as a change.
+    """
+    values = dict(zip(fields, row))
+    used = [field for field in FINGERPRINT_FIELDS if field in values]
+    digest = hashlib.sha256(json.dumps([f"{values[field]}" for field in used], ensure_ascii=False)
+                            .encode("utf-8")).hexdigest()
+    return f"{','.join(used)}|{digest}"
+
+
+class AssetStore:
+    """SQLite inventory of every asset seen across runs, keyed by host:port.
+
+    Each asset keeps first/last seen times, a fingerprint of its FOFA row, the body
+    hash of its page, its last liveness status, the time it last changed and the
+    time each later stage (nuclei scan, website analysis) last processed it.
+    Incremental runs only pass assets that changed since a stage last ran to that stage.
+    """
+
+    def __init__(self, path=os.path.join('output', 'asset_store.sqlite')):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS assets (key TEXT PRIMARY KEY, first_seen REAL, last_seen REAL, "
+                         "changed REAL, fingerprint TEXT, body_hash TEXT, last_scan REAL, last_analyzed REAL, "
+                         "status TEXT)")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(assets)")]
+        if "status" not in columns:
+            self._db.execute("ALTER TABLE assets ADD COLUMN status TEXT")
+        self._db.commit()
+
+    def observe(self, items):
+        """Record (key, fingerprint) pairs from a query; return the set of keys that are new or changed"""
+        now = time.time()
+        changed = set()
+        with self._lock:
+            for key, fingerprint in items:
+                row = self._db.execute("SELECT fingerprint FROM assets WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._db.execute("INSERT INTO assets (key, first_seen, last_seen, changed, fingerprint) "
+                                     "VALUES (?, ?, ?, ?, ?)", (key, now, now, now, fingerprint))
+                    changed.add(key)
+                elif row[0] != fingerprint and f"{row[0]}".split("|")[0] == fingerprint.split("|")[0]:
+                    self._db.execute("UPDATE assets SET last_seen = ?, changed = ?, fingerprint = ? WHERE key = ?",
+                                     (now, now, fingerprint, key))
+                    changed.add(key)
+                else:
+                    # 字段列表不同的查询无法比较，只更新指纹，不视为变化
+                    self._db.execute("UPDATE assets SET last_seen = ?, fingerprint = ? WHERE key = ?",
+                                     (now, fingerprint, key))
+            self._db.commit()
+        return changed
+
+    def update_body_hashes(self, items):
+        """Record (key, body_hash) pairs from a liveness probe; return the keys whose body hash changed.
+
+        A different hash marks the asset as changed, so later stages process it again
+        even though its FOFA row is the same.
+        """
+        now = time.time()
+        changed = set()
+        with self._lock:
+            for key, body_hash in items:
+                if not body_hash:
+                    continue
+                row = self._db.execute("SELECT body_hash FROM assets WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    continue
+                if row[0] is not None and row[0] != body_hash:
+                    self._db.execute("UPDATE assets SET changed = ? WHERE key = ?", (now, key))
+                    changed.add(key)
+                self._db.execute("UPDATE assets SET body_hash = ? WHERE key = ?", (body_hash, key))
+            self._db.commit()
+        return changed
+
+    def update_statuses(self, items):
+        """Record (key, status) pairs from a liveness check"""
+        with self._lock:
+            self._db.executemany("UPDATE assets SET status = ? WHERE key = ?",
+                                 [(f"{status}", key) for key, status in items])
+            self._db.commit()
+
+    def statuses(self, keys):
+        """Return {key: last liveness status} for the keys that have one"""
+        result = {}
+        with self._lock:
+            for key in keys:
+                row = self._db.execute("SELECT status FROM assets WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] is not None:
+                    result[key] = row[0]
+        return result
+
+    def pending(self, keys, stage):
+        """Return the keys that ``stage`` has not processed since they last changed (or at all)"""
+        column = STAGES[stage]
+        result = set()
+        with self._lock:
+            for key in keys:
+                row = self._db.execute(f"SELECT changed, {column} FROM assets WHERE key = ?", (key,)).fetchone()
+                if row is None or row[1] is None or row[1] < row[0]:
+                    result.add(key)
+        return result
+
+    def mark(self, keys, stage):
+        """Record that ``stage`` has processed ``keys`` now; unknown keys are added to the store"""
+        column = STAGES[stage]
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                self._db.execute(f"INSERT INTO assets (key, first_seen, last_seen, changed, {column}) "
+                                 f"VALUES (?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET {column} = excluded.{column}",
+                                 (key, now, now, now, now))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark for ResultSet.dedupe (the path get_search uses) against the old list-scan dedup.
+
+Usage: python benchmarks/bench_dedup.py [--sizes 10000,100000] [--baseline-max 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from results import ResultSet  # noqa: E402
+
+FIELDS = "host,protocol,ip,port,title,domain,country"
+
+
+def make_rows(n, duplicate_ratio=0.3, seed=1):
+    rng = random.Random(seed)
+    unique = int(n * (1 - duplicate_ratio)) or 1
+    base = []
+    for i in range(unique):
+        ip = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        port = rng.choice(["80", "443", "8080", "8443"])
+        base.append([f"{ip}:{port}", "http", ip, port, f"title {i}", f"d{i}.example.com", "CN"])
+    rows = base + [list(rng.choice(base)) for _ in range(n - unique)]
+    rng.shuffle(rows)
+    return rows
+
+
+def list_scan(rows):
+    unique = []
+    for row in rows:
+        if row not in unique:
+            unique.append(row)
+    return unique
+
+
+def result_set_dedupe(rows, key_fields=None):
+    # 与get_search一致：先构建ResultSet再按关键字段去重
+    return ResultSet.from_rows(rows, FIELDS).dedupe(key_fields)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FOFA result dedup")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma separated row counts")
+    parser.add_argument("--baseline-max", type=int, default=20000,
+                        help="Largest input to run the quadratic list-scan baseline on")
+    args = parser.parse_args()
+    print(f"{'rows':>8} {'whole row':>12} {'host,port':>12} {'list scan':>12} {'unique':>8}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        rows = make_rows(n)
+        whole, unique = timed(result_set_dedupe, rows)
+        keyed, _ = timed(result_set_dedupe, rows, ["host", "port"])
+        if n <= args.baseline_max:
+            baseline, baseline_unique = timed(list_scan, rows)
+            assert baseline_unique == unique
+            baseline = f"{baseline * 1000:10.1f}ms"
+        else:
+            baseline = "skipped"
+        print(f"{n:>8} {whole * 1000:10.1f}ms {keyed * 1000:10.1f}ms {baseline:>12} {unique:>8}")
+
+
+if __name__ == "__main__":
+    main()
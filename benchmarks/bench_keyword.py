@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark for results.KeywordFilter against the old per-cell regex loop.
+
+Usage: python benchmarks/bench_keyword.py [--sizes 10000,100000] [--keywords "title 99,example"]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from bench_dedup import FIELDS, make_rows  # noqa: E402
+from results import KeywordFilter, ResultSet  # noqa: E402
+
+
+def per_cell(rows, keywords):
+    pattern = keywords.replace(",", "|")
+    matched = []
+    for data in rows:
+        for item in data:
+            if re.search(re.compile(pattern, re.I), item):
+                matched.append(data)
+                break
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keyword filtering")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma separated row counts")
+    parser.add_argument("--keywords", default="title 99,d12.example,10\\.0\\.3\\.", help="Comma separated keywords")
+    args = parser.parse_args()
+    print(f"{'rows':>8} {'filter':>12} {'per cell':>12} {'matched':>8}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        rows = make_rows(n)
+        result_set = ResultSet.from_rows(rows, FIELDS)
+        start = time.perf_counter()
+        matched = KeywordFilter(args.keywords).match(result_set)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        baseline = per_cell(rows, args.keywords)
+        baseline_elapsed = time.perf_counter() - start
+        assert len(baseline) == len(matched)
+        print(f"{n:>8} {elapsed * 1000:10.1f}ms {baseline_elapsed * 1000:10.1f}ms {len(matched):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+logger = logging.getLogger(__name__)
+
+# 统计页面已发起的资源请求数量，用于判断网络是否空闲
+_RESOURCE_COUNT_JS = "return window.performance.getEntriesByType('resource').length"
+
+
+class BrowserPool:
+    """A pool of headless Chrome workers shared by the render stage.
+
+    Each worker keeps reusing its single tab and is recycled after ``max_pages``
+    pages, or immediately when it crashes. Workers are started lazily.
+    """
+
+    def __init__(self, size=2, max_pages=50, driver_path=None, page_load_timeout=15, idle_time=0.5):
+        self.size = max(1, int(size))
+        self.max_pages = max_pages
+        self.driver_path = driver_path
+        self.page_load_timeout = page_load_timeout
+        self.idle_time = idle_time
+        self._idle = queue.Queue()
+        self._pages = {}
+        self._created = 0
+        self._lock = threading.Lock()
+        self._service_path = None
+
+    def _chrome_options(self):
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--window-size=1920,1080")
+
+        # 忽略SSL证书错误
+        chrome_options.add_argument("--ignore-certificate-errors")
+        chrome_options.add_argument("--ignore-ssl-errors")
+        chrome_options.add_argument("--allow-insecure-localhost")
+        chrome_options.add_argument("--allow-running-insecure-content")
+        chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
+        return chrome_options
+
+    def _create_driver(self):
+        if self._service_path is None:
+            # 使用配置文件中指定的ChromeDriver路径
+            if self.driver_path and os.path.exists(self.driver_path):
+                logger.info(f"Using ChromeDriver from: {self.driver_path}")
+                self._service_path = self.driver_path
+            else:
+                # 如果指定路径不存在，尝试自动下载（只下载一次）
+                logger.warning(f"ChromeDriver not found at: {self.driver_path}, trying automatic download")
+                self._service_path = ChromeDriverManager().install()
+        driver = webdriver.Chrome(service=Service(executable_path=self._service_path),
+                                  options=self._chrome_options())
+        driver.set_page_load_timeout(self.page_load_timeout)
+        return driver
+
+    def start(self):
+        """Start one worker up front so a broken Chrome setup is reported early"""
+        driver = self._acquire()
+        self._release(driver)
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                spawn = self._created < self.size
+                if spawn:
+                    self._created += 1
+            if spawn:
+                break
+            # 池已满时等待空闲实例，被回收的实例会腾出新建名额
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+        try:
+            driver = self._create_driver()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        self._pages[id(driver)] = 0
+        logger.info(f"Browser worker started ({self._created}/{self.size})")
+        return driver
+
+    def _release(self, driver, broken=False):
+        pages = self._pages.get(id(driver), 0)
+        if broken or pages >= self.max_pages:
+            reason = "crashed" if broken else f"rendered {pages} pages"
+            logger.info(f"Recycling browser worker ({reason})")
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+
+    def _discard(self, driver):
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing browser: {e}")
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def page(self):
+        """Borrow a browser worker for one page"""
+        driver = self._acquire()
+        self._pages[id(driver)] += 1
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self._release(driver, broken)
+
+    def wait_until_ready(self, driver, timeout=None):
+        """Wait for document.readyState == 'complete' and a quiet network, up to a ceiling"""
+        deadline = time.monotonic() + (timeout or self.page_load_timeout)
+        while time.monotonic() < deadline:
+            if driver.execute_script("return document.readyState") == "complete":
+                break
+            time.sleep(0.1)
+        # 资源请求数量在idle_time内不再增长即视为网络空闲
+        last_count = -1
+        quiet_since = time.monotonic()
+        while time.monotonic() < deadline:
+            count = driver.execute_script(_RESOURCE_COUNT_JS)
+            if count != last_count:
+                last_count = count
+                quiet_since = time.monotonic()
+            elif time.monotonic() - quiet_since >= self.idle_time:
+                return True
+            time.sleep(0.1)
+        return False
+
+    def close(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+        logger.info("Browser pool closed")
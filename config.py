@@ -16,6 +16,54 @@ use_gpu = False  # 不使用GPU加速EasyOCR
 tesseract_cmd = r'E:\XU\APP\OCR\tesseract.exe'
 tesseract_lang = 'chi_sim+eng'
 
+# OCR服务设置
+ocr_batch_size = 8  # 每批送入模型的图片数量
+ocr_max_side = 1280  # 识别前将图片最长边缩放到该像素以内
+image_cache_dir = 'output/image_cache'  # 图片及OCR结果缓存目录，多次运行之间共享
+image_cache_max_mb = 512  # 缓存大小上限，超出后按最近最少使用淘汰
+
 # Analysis Settings
 timeout = 10  # seconds for HTTP requests
-max_retries = 3 
\ No newline at end of file
+max_retries = 3 
+
+# LLM请求调度：并发上限与速率限制（按API配额填写）
+llm_concurrency = 8  # 同时进行的LLM请求数
+llm_requests_per_min = 60  # 每分钟请求数上限（RPM）
+llm_tokens_per_min = 90000  # 每分钟token数上限（TPM）
+llm_max_retries = 5  # 遇到429/5xx时的最大重试次数
+llm_batch_size = 1  # 每次请求合并分析的目标数量，1为逐个分析（可用--batch_size覆盖）
+
+# 本地预筛选：根据标题、ICP备案/版权信息、默认页面等规则打分，明确的目标不再调用LLM
+prefilter_enabled = True
+prefilter_positive = 80  # 得分不低于该值直接判定为属于目标公司
+prefilter_negative = -50  # 得分不高于该值直接判定为不属于目标公司
+company_aliases = []  # 目标公司的其他名称/品牌名，如 ['ACME', '艾克米']
+
+# LLM verdict cache: hosts with identical pages reuse one verdict
+verdict_cache_path = 'output/verdict_cache.sqlite'
+verdict_cache_days = 7  # 缓存有效期（天）
+
+# Liveness probe reuse: pages saved by FastCheck (fofa.ini [fast_check] probe = on) are not fetched again
+reuse_probes = True
+probe_store_path = 'output/probe_store.sqlite'
+probe_store_hours = 24  # 超过该时间的probe结果不再复用
+
+# Incremental mode (--diff): hosts analyzed since they last changed are skipped
+asset_store_path = 'output/asset_store.sqlite'  # 与fofa.ini [diff] store保持一致
+
+# Pipeline Settings
+# 分析流水线各阶段的并发数，总耗时由最慢的阶段决定
+fetch_workers = 64  # 网页抓取（实际并发由http_concurrency控制）
+render_workers = 4  # 浏览器截图，同时也是无头浏览器实例的数量
+ocr_workers = 4  # OCR识别（共享同一个OCR模型，由OCR服务合批处理）
+llm_workers = 16  # LLM分析请求（实际并发由llm_concurrency控制）
+pipeline_queue_size = 32  # 阶段之间队列的最大长度
+
+# Browser Pool Settings
+browser_recycle_pages = 50  # 每个浏览器实例渲染多少个页面后重启
+page_load_timeout = 15  # 页面就绪等待上限（秒）
+network_idle_time = 0.5  # 资源请求停止增长多少秒后视为网络空闲
+
+# HTTP Fetch Settings
+http_concurrency = 64  # 全局最大并发请求数
+http_per_host = 4  # 单个主机最大并发连接数
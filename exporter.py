@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import csv
+import os
+import re
+
+import xlsxwriter
+
+# xlsx单个sheet最多1048576行（含表头），超出部分写入续表
+MAX_SHEET_ROWS = 1048575
+ERROR_MARK = "规则不存在"
+
+
+def export_rows(rows, width, add_id=False):
+    """Yield output rows of exactly ``width`` cells, prepending an id when ``add_id`` is set.
+
+    FOFA error rows (containing "规则不存在") carry the joined message in every data cell.
+    """
+    for n, item in enumerate(rows, 1):
+        if isinstance(item, str):
+            item = [item]
+        if ERROR_MARK in item:
+            error = "".join(item[1:])
+            yield [n] + [error] * (width - 1) if add_id else [error] * width
+            continue
+        values = [n, *item] if add_id else list(item)
+        values = values[:width]
+        if len(values) < width:
+            values.extend([""] * (width - len(values)))
+        yield values
+
+
+def sheet_name(name):
+    return re.sub(r'[\[\]:*?/\\]', '_', name[:31])
+
+
+def write_excel(filename, sheets, field, add_id=False):
+    """Stream ``sheets`` ({name: rows}) into an xlsx file with constant memory use.
+
+    Rows are written one ``write_row`` call at a time and flushed to disk as the
+    sheet grows, so memory does not depend on the number of rows. Sheets longer
+    than the xlsx row limit continue on "<name> (2)", "<name> (3)", ...
+    """
+    with xlsxwriter.Workbook(filename, {"constant_memory": True}) as workbook:
+        title_format = workbook.add_format(
+            {'font_size': 14, 'border': 1, 'bold': True, 'font_color': 'white', 'bg_color': '#4BACC6',
+             'align': 'center', 'valign': 'center', 'text_wrap': True})
+        content_format = workbook.add_format({'border': 1, 'align': 'center', 'valign': 'vcenter', 'text_wrap': True})
+
+        def new_sheet(name):
+            worksheet = workbook.add_worksheet(sheet_name(name) if name else None)
+            worksheet.set_column(0, len(field) - 1, 30)
+            worksheet.write_row(0, 0, field, title_format)
+            return worksheet
+
+        for name, rows in sheets.items():
+            worksheet = new_sheet(name)
+            part = 1
+            row = 1
+            for values in export_rows(rows, len(field), add_id):
+                if row > MAX_SHEET_ROWS:
+                    part += 1
+                    worksheet = new_sheet(f"{(name or 'Sheet')[:25]} ({part})")
+                    row = 1
+                worksheet.write_row(row, 0, values, content_format)
+                row += 1
+    return [filename]
+
+
+def write_csv(filename, sheets, field, add_id=False):
+    """Write each sheet to its own CSV file (utf-8 with BOM so Excel opens it correctly)"""
+    base, _ = os.path.splitext(filename)
+    files = []
+    for name, rows in sheets.items():
+        path = f"{base}-{sheet_name(name)}.csv" if name and len(sheets) > 1 else f"{base}.csv"
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(field)
+            writer.writerows(export_rows(rows, len(field), add_id))
+        files.append(path)
+    return files
+
+
+def write_parquet(filename, sheets, field, add_id=False, chunk_rows=100000):
+    """Write each sheet to a Parquet file in row groups of ``chunk_rows``; requires pyarrow"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    base, _ = os.path.splitext(filename)
+    schema = pa.schema([(f"{column}", pa.string()) for column in field])
+    files = []
+    for name, rows in sheets.items():
+        path = f"{base}-{sheet_name(name)}.parquet" if name and len(sheets) > 1 else f"{base}.parquet"
+        with pq.ParquetWriter(path, schema) as writer:
+            chunk = []
+            for values in export_rows(rows, len(field), add_id):
+                chunk.append(["" if v is None else f"{v}" for v in values])
+                if len(chunk) >= chunk_rows:
+                    writer.write_table(pa.Table.from_arrays([pa.array(c, pa.string()) for c in zip(*chunk)],
+                                                            schema=schema))
+                    chunk = []
+            if chunk:
+                writer.write_table(pa.Table.from_arrays([pa.array(c, pa.string()) for c in zip(*chunk)],
+                                                        schema=schema))
+        files.append(path)
+    return files
+
+
+WRITERS = {"xlsx": write_excel, "csv": write_csv, "parquet": write_parquet}
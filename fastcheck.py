@@ -1,44 +1,243 @@
 import asyncio
+import hashlib
+import html
 import random
+import re
+import ssl
 import aiohttp
 
+try:
+    from cryptography import x509
+except ImportError:  # 未安装cryptography时不解析证书主题和SAN
+    x509 = None
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/63.0.3239.132 Safari/537.3',
+    'Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; AS; rv:11.0) like Gecko',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/62.0.3282.140 Safari/537.3',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/113.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/103.0.5026.0 Safari/537.36 Edg/103.0.1253.0',
+    'Mozilla/4.0 (compatible; MSIE 6.0; Linux 2.6.26-1-amd64) Lobo/0.98.3',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 15_3 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/98.0.4758.85 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Linux; Android 13; SM-A037U) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/112.0.0.0 Mobile Safari/537.36 uacq']
+
 
 class FastCheck:
-    def __init__(self, aim_urls, timeout=5):
+    """Liveness check of many URLs through one shared session.
+
+    At most ``concurrency`` requests are in flight (``per_host`` per host), DNS
+    answers are cached for ``dns_ttl`` seconds, and every result is passed to
+    ``on_result(url, status)`` as soon as it is known.
+
+    With ``rich=True`` each check also records the page title, Server header,
+    content length, body hash, redirect chain and TLS certificate subject/SAN in
+    ``probe_dict``; the probes and page bodies are written to ``store`` when given.
+    """
+
+    def __init__(self, aim_urls, timeout=5, concurrency=200, per_host=10, dns_ttl=300, on_result=None,
+                 rich=False, max_body=1024 * 1024, store=None):
         self.urls = aim_urls
         self.result_dict = {}
+        self.probe_dict = {}
+        self.rich = rich
+        self.max_body = max_body
+        self.store = store
+        self._certs = {}
         self.timeout = timeout
-        self.user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_13_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/63.0.3239.132 Safari/537.3',
-            'Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; AS; rv:11.0) like Gecko',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/62.0.3282.140 Safari/537.3',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/113.0',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/103.0.5026.0 Safari/537.36 Edg/103.0.1253.0',
-            'Mozilla/4.0 (compatible; MSIE 6.0; Linux 2.6.26-1-amd64) Lobo/0.98.3',
-            'Mozilla/5.0 (iPhone; CPU iPhone OS 15_3 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) CriOS/98.0.4758.85 Mobile/15E148 Safari/604.1',
-            'Mozilla/5.0 (Linux; Android 13; SM-A037U) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/112.0.0.0 Mobile Safari/537.36 uacq']
-
-    async def check_url(self, url):
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(verify_ssl=False)) as session:
-            headers = {'User-Agent': random.choice(self.user_agents)}
-            try:
-                async with session.get(url, headers=headers, timeout=self.timeout) as response:
-                    if response.status == 200:
-                        self.result_dict[url] = "200"
-                    else:
-                        self.result_dict[url] = "{}".format(response.status)
-            except asyncio.TimeoutError:
-                self.result_dict[url] = "Timeout exceeds {}s".format(self.timeout)
-            except aiohttp.ClientError as e:
-                self.result_dict[url] = "Unknown error"
+        self.concurrency = max(1, int(concurrency))
+        self.per_host = per_host
+        self.dns_ttl = dns_ttl
+        self.on_result = on_result
+        self.user_agents = USER_AGENTS
 
+    def _session(self):
+        connector = aiohttp.TCPConnector(ssl=False, limit=self.concurrency, limit_per_host=self.per_host,
+                                         ttl_dns_cache=self.dns_ttl, enable_cleanup_closed=True)
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def check_url(self, session, url):
+        headers = {'User-Agent': random.choice(self.user_agents)}
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 200:
+                    self.result_dict[url] = "200"
+                else:
+                    self.result_dict[url] = "{}".format(response.status)
+                if self.rich:
+                    await self._probe(url, response)
+        except asyncio.TimeoutError:
+            self.result_dict[url] = "Timeout exceeds {}s".format(self.timeout)
+        except (aiohttp.ClientError, ValueError):
+            self.result_dict[url] = "Unknown error"
         return self.result_dict[url]
 
+    async def _peer_cert(self, response):
+        """DER certificate of the server that sent ``response``, or None for plain HTTP or on failure"""
+        url = response.url
+        if url.scheme != "https":
+            return None
+        connection = response.connection
+        ssl_object = connection.transport.get_extra_info("ssl_object") \
+            if connection is not None and connection.transport is not None else None
+        if ssl_object is not None:
+            return ssl_object.getpeercert(binary_form=True)
+        # 响应体较小时aiohttp在返回响应前就已释放连接，此时单独握手一次获取证书，同一host:port只握手一次
+        key = (url.host, url.port)
+        if key not in self._certs:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(url.host, url.port, ssl=context, server_hostname=url.host),
+                    self.timeout)
+            except (OSError, asyncio.TimeoutError, ssl.SSLError):
+                self._certs[key] = None
+            else:
+                self._certs[key] = writer.get_extra_info("ssl_object").getpeercert(binary_form=True)
+                writer.close()
+        return self._certs[key]
+
+    async def _tls_info(self, response):
+        if x509 is None:
+            return "", ""
+        der = await self._peer_cert(response)
+        if not der:
+            return "", ""
+        try:
+            cert = x509.load_der_x509_certificate(der)
+        except Exception:
+            return "", ""
+        try:
+            san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+            names = san.get_values_for_type(x509.DNSName) + [f"{ip}" for ip in san.get_values_for_type(x509.IPAddress)]
+        except x509.ExtensionNotFound:
+            names = []
+        return cert.subject.rfc4514_string(), ",".join(names)
+
+    async def _probe(self, url, response):
+        tls_subject, tls_san = await self._tls_info(response)
+        body = await response.content.read(self.max_body)
+        try:
+            text = body.decode(response.charset or "utf-8", errors="replace")
+        except LookupError:
+            text = body.decode("utf-8", errors="replace")
+        length = response.headers.get("Content-Length", "")
+        title = re.search(r"<title[^>]*>(.*?)</title>", text, re.I | re.S)
+        probe = {
+            "status": self.result_dict[url],
+            "final_url": f"{response.url}",
+            "title": html.unescape(title.group(1)).strip()[:200] if title else "",
+            "server": response.headers.get("Server", ""),
+            "content_length": int(length) if length.isdigit() else len(body),
+            "body_hash": hashlib.sha256(body).hexdigest(),
+            "redirects": [f"{r.url}" for r in response.history] + ([f"{response.url}"] if response.history else []),
+            "tls_subject": tls_subject,
+            "tls_san": tls_san,
+        }
+        self.probe_dict[url] = probe
+        if self.store is not None:
+            self.store.put(url, probe, text)
+
+    async def iter_results(self):
+        """Yield (url, status) pairs in completion order"""
+        pending = iter(self.urls)
+        results = asyncio.Queue()
+
+        # 固定数量的worker从任务列表中取URL，同时打开的连接数不会超过concurrency
+        async def worker(session):
+            for url in pending:
+                await results.put((url, await self.check_url(session, url)))
+
+        async with self._session() as session:
+            workers = [asyncio.ensure_future(worker(session)) for _ in range(self.concurrency)]
+            done = asyncio.ensure_future(asyncio.gather(*workers))
+            try:
+                while not (done.done() and results.empty()):
+                    getter = asyncio.ensure_future(results.get())
+                    await asyncio.wait([getter, done], return_when=asyncio.FIRST_COMPLETED)
+                    if getter.done():
+                        yield getter.result()
+                    else:
+                        getter.cancel()
+                done.result()
+            finally:
+                for task in workers:
+                    task.cancel()
+
     async def check_urls(self):
-        tasks = []
-        for url in self.urls:
-            task = asyncio.ensure_future(self.check_url(url))
-            tasks.append(task)
-        return await asyncio.gather(*tasks)
+        async for url, status in self.iter_results():
+            if self.on_result is not None:
+                self.on_result(url, status)
+        if self.store is not None:
+            self.store.commit()
+        return [self.result_dict[url] for url in self.urls]
+
+
+class AsyncFetcher:
+    def __init__(self, timeout=10, max_retries=3, concurrency=64, per_host=4, backoff=1.0):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.backoff = backoff
+        self.user_agents = USER_AGENTS
+        self._session = None
+        self._semaphore = None
+
+    async def _get_session(self):
+        # 会话和连接池只创建一次，同一主机的连接保持长连接复用
+        if self._session is None:
+            connector = aiohttp.TCPConnector(ssl=False, limit=self.concurrency, limit_per_host=self.per_host,
+                                             keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def fetch_url(self, url):
+        session = await self._get_session()
+        headers = {'User-Agent': random.choice(self.user_agents)}
+        for attempt in range(self.max_retries):
+            try:
+                async with self._semaphore:
+                    async with session.get(url, headers=headers) as response:
+                        body = await response.read()
+                        text = await response.text(errors="replace")
+                        return {"url": url, "status": response.status, "body": body, "text": text}
+            except (asyncio.TimeoutError, aiohttp.ClientError):
+                if attempt == self.max_retries - 1:
+                    raise
+                # 指数退避并加入随机抖动，避免大量重试同时打到同一主机
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def fetch(self, host):
+        if host.startswith(('http://', 'https://')):
+            urls = [host]
+        else:
+            urls = [f"http://{host}", f"https://{host}"]
+        tasks = [asyncio.ensure_future(self.fetch_url(url)) for url in urls]
+        fallback = None
+        try:
+            # http和https同时发起，取最先返回200的结果
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    result = await next_done
+                except (asyncio.TimeoutError, aiohttp.ClientError):
+                    continue
+                if result["status"] == 200:
+                    return result
+                fallback = fallback or result
+        finally:
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    task.exception()  # 标记异常已读取，避免事件循环告警
+                task.cancel()
+        return fallback
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -1,30 +1,118 @@
+import asyncio
 import configparser
 import base64
 import json
-import urllib
-import urllib.request
-import urllib.parse
-import ssl
+import os
+import threading
+import time
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from query_cache import QueryCache
+
+# 依次探测的FOFA接口地址，探测结果缓存在ENDPOINT_CACHE中
+ENDPOINTS = ["https://fofa.so", "https://fofa.info"]
+ENDPOINT_CACHE = ".fofa_endpoint"
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by every request sent to the FOFA API"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 令牌不足时先预支，再在锁外等待，后来的请求依次排队
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            await asyncio.sleep(wait)
 
 
 class Client:
-    def __init__(self):
+    def __init__(self, use_cache=None, cache_ttl=None):
         config = configparser.ConfigParser()
         config.read('fofa.ini', encoding="utf-8")
         self.email = config.get("userinfo", "email")
         self.key = config.get("userinfo", "key")
         self.size = config.get("size", "size")
         self.full = config.get("full", "full")
-        self.base_url = "https://fofa.so"
-        try:
-            req = urllib.request.Request(self.base_url)
-            urllib.request.urlopen(req).read().decode('utf-8')
-        except:
-            self.base_url = "https://fofa.info"
+        self.limiter = RateLimiter(config.getfloat("concurrency", "rate", fallback=2))
+        self.timeout = config.getfloat("client", "timeout", fallback=30)
+        self.retries = config.getint("client", "retries", fallback=3)
+        self.backoff = config.getfloat("client", "backoff", fallback=0.5)
+        self.pool_size = config.getint("client", "pool_size", fallback=10)
+        self.endpoint_ttl = config.getfloat("client", "endpoint_cache_hours", fallback=24) * 3600
+        # 查询结果缓存，重复的查询直接读取本地结果，不再消耗F币和查询额度
+        if use_cache is None:
+            use_cache = config.get("cache", "cache", fallback="on") == "on"
+        if cache_ttl is None:
+            cache_ttl = config.getfloat("cache", "ttl_hours", fallback=24)
+        self.cache = QueryCache(config.get("cache", "path", fallback=os.path.join('output', 'fofa_cache.sqlite')),
+                                ttl=cache_ttl * 3600) if use_cache and cache_ttl > 0 else None
+        # 连接池+长连接复用，失败的请求按退避策略自动重试
+        self.session = requests.Session()
+        self.session.verify = False
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                              max_retries=Retry(total=self.retries, backoff_factor=self.backoff,
+                                                status_forcelist=[429, 500, 502, 503, 504],
+                                                allowed_methods=["GET"]))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.base_url = self.__choose_endpoint()
         self.search_api_url = "/api/v1/search/all"
         self.login_api_url = "/api/v1/info/my"
+        self.host_api_url = "/api/v1/host/"
+        self.stats_api_url = "/api/v1/search/stats"
         self.get_userinfo()  # check email and key
 
+    def __choose_endpoint(self):
+        # 探测结果缓存到本地文件，有效期内启动时不再重复探测fofa.so
+        try:
+            with open(ENDPOINT_CACHE, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if time.time() - cached["checked"] < self.endpoint_ttl:
+                return cached["base_url"]
+        except (OSError, ValueError, KeyError):
+            pass
+        base_url = "https://fofa.info"
+        for candidate in ENDPOINTS:
+            try:
+                self.session.get(candidate, timeout=min(self.timeout, 5)).raise_for_status()
+                base_url = candidate
+                break
+            except requests.RequestException:
+                continue
+        try:
+            with open(ENDPOINT_CACHE, "w", encoding="utf-8") as f:
+                json.dump({"base_url": base_url, "checked": time.time()}, f)
+        except OSError:
+            pass
+        return base_url
+
     def get_userinfo(self):
         api_full_url = "%s%s" % (self.base_url, self.login_api_url)
         param = {"email": self.email, "key": self.key}
@@ -37,23 +125,112 @@ class Client:
 
     def get_json_data(self, query_str, page=1, fields=""):
         api_full_url = "%s%s" % (self.base_url, self.search_api_url)
-        param = {"qbase64": base64.b64encode(bytes(query_str.encode('utf-8'))), "email": self.email, "key": self.key,
-                 "page": page,
-                 "fields": fields,
-                 "size": self.size,
-                 "full": self.full}
-        res = self.__http_get(api_full_url, param)
+        param = self.search_param(query_str, page, fields)
+        res = self.__http_get(api_full_url, param, cache=True)
         return res
 
-    def __http_get(self, url, param):
-        ssl._create_default_https_context = ssl._create_unverified_context
-        param = urllib.parse.urlencode(param)
-        url = "%s?%s" % (url, param)
-        try:
-            req = urllib.request.Request(url)
-            res = urllib.request.urlopen(req).read().decode('utf-8')
-            if "errmsg" in res:
-                raise RuntimeError(res)
-        except Exception as e:
-            raise e
+    def search_param(self, query_str, page=1, fields=""):
+        return {"qbase64": base64.b64encode(bytes(query_str.encode('utf-8'))).decode(), "email": self.email,
+                "key": self.key,
+                "page": page,
+                "fields": fields,
+                "size": self.size,
+                "full": self.full}
+
+    def get_host(self, host):
+        api_full_url = "%s%s%s" % (self.base_url, self.host_api_url, host)
+        param = {"detail": "true", "email": self.email, "key": self.key}
+        return json.loads(self.__http_get(api_full_url, param, check=False, cache=True))
+
+    def get_stats(self, query_str, fields):
+        api_full_url = "%s%s" % (self.base_url, self.stats_api_url)
+        param = {"fields": fields, "qbase64": base64.b64encode(bytes(query_str.encode('utf-8'))).decode(),
+                 "email": self.email, "key": self.key}
+        return json.loads(self.__http_get(api_full_url, param, check=False, cache=True))
+
+    def cache_get(self, url, param):
+        """Cached response text for a request, or None; keyed without the endpoint so fofa.so/fofa.info share it"""
+        if self.cache is None:
+            return None
+        return self.cache.get(url[len(self.base_url):], param)
+
+    def cache_put(self, url, param, res):
+        # 只缓存成功的响应
+        if self.cache is not None and "errmsg" not in res:
+            self.cache.put(url[len(self.base_url):], param, res)
+
+    def __http_get(self, url, param, check=True, cache=False):
+        if cache:
+            res = self.cache_get(url, param)
+            if res is not None:
+                return res
+        self.limiter.acquire()
+        res = self.session.get(url, params=param, timeout=self.timeout)
+        res.encoding = "utf-8"
+        res = res.text
+        if check and "errmsg" in res:
+            raise RuntimeError(res)
+        if cache:
+            self.cache_put(url, param, res)
+        return res
+
+
+class AsyncClient:
+    """aiohttp variant of Client for callers running inside an event loop.
+
+    Shares the endpoint choice, credentials, query cache and rate limiter of a synchronous Client.
+    """
+
+    def __init__(self, client, concurrency=10):
+        self.client = client
+        self.concurrency = concurrency
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(ssl=False, limit=self.concurrency, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.client.timeout))
+        return self._session
+
+    async def _http_get(self, url, param, check=True):
+        session = await self._get_session()
+        # 与同步客户端的重试策略一致：限流和服务端错误按退避重试，重试耗尽后抛出异常
+        for attempt in range(self.client.retries + 1):
+            await self.client.limiter.acquire_async()
+            try:
+                async with session.get(url, params=param) as response:
+                    if response.status in (429, 500, 502, 503, 504):
+                        if attempt == self.client.retries:
+                            response.raise_for_status()
+                        await asyncio.sleep(self.client.backoff * 2 ** attempt)
+                        continue
+                    res = await response.text(encoding="utf-8")
+                    break
+            except (asyncio.TimeoutError, aiohttp.ClientError):
+                if attempt == self.client.retries:
+                    raise
+                await asyncio.sleep(self.client.backoff * 2 ** attempt)
+        if check and "errmsg" in res:
+            raise RuntimeError(res)
         return res
+
+    async def get_data(self, query_str, page=1, fields=""):
+        api_full_url = "%s%s" % (self.client.base_url, self.client.search_api_url)
+        param = self.client.search_param(query_str, page, fields)
+        res = self.client.cache_get(api_full_url, param)
+        if res is None:
+            res = await self._http_get(api_full_url, param)
+            self.client.cache_put(api_full_url, param, res)
+        return json.loads(res)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class ImageCache:
+    """On-disk, content-addressed cache of downloaded images and their OCR results.
+
+    Entries are keyed by the SHA-256 of the image bytes and evicted in LRU order
+    once the stored images exceed ``max_bytes``. Image URLs are also mapped to
+    their hash, so a URL seen recently does not have to be downloaded again.
+    """
+
+    def __init__(self, cache_dir=os.path.join('output', 'image_cache'), max_bytes=512 * 1024 * 1024,
+                 url_ttl=86400):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.url_ttl = url_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS images (sha256 TEXT PRIMARY KEY, size INTEGER, width INTEGER, "
+                         "height INTEGER, ocr_text TEXT, last_access REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS images_last_access ON images (last_access)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, sha256 TEXT, updated REAL)")
+        self._db.commit()
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0]
+
+    @staticmethod
+    def hash_file(path):
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.cache_dir, sha256[:2], sha256)
+
+    def get(self, sha256):
+        """Return the cached entry for an image hash, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT width, height, ocr_text FROM images WHERE sha256 = ?",
+                                   (sha256,)).fetchone()
+            if row is None or not os.path.exists(self._blob_path(sha256)):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE images SET last_access = ? WHERE sha256 = ?", (time.time(), sha256))
+            self._db.commit()
+        return {"sha256": sha256, "width": row[0], "height": row[1], "ocr_text": row[2],
+                "path": self._blob_path(sha256)}
+
+    def get_url(self, url):
+        """Return the cached entry for a recently downloaded image URL, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT sha256 FROM urls WHERE url = ? AND updated > ?",
+                                   (url, time.time() - self.url_ttl)).fetchone()
+        return self.get(row[0]) if row else None
+
+    @staticmethod
+    def _dimensions(path):
+        try:
+            with Image.open(path) as img:
+                return img.size
+        except Exception:
+            return 0, 0
+
+    def put(self, path, sha256, ocr_text, url=None):
+        """Store an image file and its OCR result, then evict old entries if over the size limit"""
+        blob_path = self._blob_path(sha256)
+        size = os.path.getsize(path)
+        width, height = self._dimensions(path)
+        with self._lock:
+            exists = self._db.execute("SELECT 1 FROM images WHERE sha256 = ?", (sha256,)).fetchone()
+            if not exists:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                shutil.copyfile(path, blob_path)
+                self._total += size
+            self._db.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)",
+                             (sha256, size, width, height, ocr_text, time.time()))
+            if url:
+                self._db.execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?)", (url, sha256, time.time()))
+            self._db.commit()
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def put_url(self, url, sha256):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?)", (url, sha256, time.time()))
+            self._db.commit()
+
+    def _evict(self):
+        # 按最近访问时间淘汰，直到缓存降到上限的90%以下
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for sha256, size in self._db.execute("SELECT sha256, size FROM images ORDER BY last_access").fetchall():
+            if self._total <= target:
+                break
+            try:
+                os.remove(self._blob_path(sha256))
+            except OSError:
+                pass
+            self._db.execute("DELETE FROM images WHERE sha256 = ?", (sha256,))
+            self._db.execute("DELETE FROM urls WHERE sha256 = ?", (sha256,))
+            self._total -= size
+            evicted += 1
+        self._db.commit()
+        logger.info(f"Image cache evicted {evicted} entries, {self._total / 1024 / 1024:.1f} MB left")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    """Append-only JSON lines checkpoint of finished hosts, one {"no", "result"} record per line.
+
+    A run killed mid-write leaves a torn last line. ``load`` skips it and ``open``
+    cuts it off before appending, so new records always start on a line of their own.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def load(self):
+        """Read finished hosts as {host number: result entry}"""
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be cut short if the previous run was killed mid-write
+                    logger.warning("Skipping truncated journal line")
+                    continue
+                done[record["no"]] = record["result"]
+        return done
+
+    def _repair(self):
+        """Truncate the file back to its last newline, dropping a torn final record"""
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if not size:
+                return
+            f.seek(max(0, size - 1))
+            if f.read(1) == b'\n':
+                return
+            # 从文件末尾向前查找最后一个换行符，之后的残缺记录直接截掉
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    f.truncate(start + newline + 1)
+                    return
+                end = start
+            f.truncate(0)
+
+    def open(self):
+        if os.path.exists(self.path):
+            self._repair()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return self
+
+    def write(self, no, result):
+        self._file.write(json.dumps({"no": no, "result": result}, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
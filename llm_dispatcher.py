@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import openai
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``rate_per_min`` units per minute"""
+
+    def __init__(self, rate_per_min):
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(rate_per_min)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta):
+        """Give back (or charge extra) tokens once the real cost of a request is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+def _retry_after(error):
+    """Seconds to wait according to the Retry-After headers of an API error, or None"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class LLMDispatcher:
+    """Async chat-completion client with a concurrency limit, RPM/TPM rate limiting and retries.
+
+    Retries 429, 5xx and connection errors with exponential backoff, honouring
+    Retry-After when the API sends it, and keeps per-call latency and token usage.
+    """
+
+    def __init__(self, api_key, base_url, max_concurrency=8, requests_per_min=60, tokens_per_min=90000,
+                 max_retries=5, backoff=1.0, max_backoff=60, completion_tokens=512):
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.max_concurrency = max_concurrency
+        self.requests_per_min = requests_per_min
+        self.tokens_per_min = tokens_per_min
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.completion_tokens = completion_tokens
+        self.calls = []
+        self.retries = 0
+        self._semaphore = None
+        self._request_bucket = None
+        self._token_bucket = None
+
+    def _init_limits(self):
+        # 限流对象需要在事件循环内创建
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._request_bucket = TokenBucket(self.requests_per_min)
+            self._token_bucket = TokenBucket(self.tokens_per_min)
+
+    def estimate_tokens(self, messages):
+        # 粗略估算：中英文混合内容约每3个字符一个token，另加预计的回复长度
+        return sum(len(m["content"]) for m in messages) // 3 + self.completion_tokens
+
+    async def chat(self, model, messages):
+        """Send one chat completion and return (content, usage) where usage holds tokens and latency"""
+        self._init_limits()
+        estimate = self.estimate_tokens(messages)
+        for attempt in range(self.max_retries + 1):
+            await self._request_bucket.acquire()
+            await self._token_bucket.acquire(estimate)
+            start_time = time.monotonic()
+            try:
+                async with self._semaphore:
+                    response = await self.client.chat.completions.create(model=model, messages=messages)
+            except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+                self._token_bucket.adjust(estimate)  # 失败的请求不计入token用量
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                self.retries += 1
+                logger.warning(f"LLM request failed ({type(e).__name__}), retrying in {delay:.1f}s "
+                               f"({attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+                continue
+            latency = time.monotonic() - start_time
+            usage = {
+                "latency": latency,
+                "prompt_tokens": getattr(response.usage, "prompt_tokens", 0) or 0,
+                "completion_tokens": getattr(response.usage, "completion_tokens", 0) or 0,
+                "attempts": attempt + 1,
+            }
+            total = usage["prompt_tokens"] + usage["completion_tokens"]
+            if total:
+                self._token_bucket.adjust(estimate - total)
+            self.calls.append(usage)
+            return response.choices[0].message.content, usage
+
+    def stats(self):
+        calls = len(self.calls)
+        latency = sum(c["latency"] for c in self.calls)
+        return {
+            "calls": calls,
+            "retries": self.retries,
+            "prompt_tokens": sum(c["prompt_tokens"] for c in self.calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in self.calls),
+            "avg_latency": latency / calls if calls else 0.0,
+            "max_latency": max((c["latency"] for c in self.calls), default=0.0),
+        }
+
+    async def close(self):
+        await self.client.close()
@@ -1,4 +1,168 @@
+import json
+import os
 import platform
+import queue
+import shlex
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# nuclei的严重程度，按从高到低的顺序统计
+SEVERITIES = ["critical", "high", "medium", "low", "info", "unknown"]
+# 扫描结果导出时的列
+FINDING_FIELDS = ["id", "severity", "template-id", "name", "host", "matched-at", "ip", "type", "matcher-name",
+                  "extracted-results", "timestamp"]
+
+
+def parse_finding(line):
+    """Parse one line of nuclei -jsonl output, returning None for anything that is not a finding"""
+    line = line.strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) and "template-id" in record else None
+
+
+def severity(record):
+    value = f"{(record.get('info') or {}).get('severity') or 'unknown'}".lower()
+    return value if value in SEVERITIES else "unknown"
+
+
+def finding_row(record):
+    """Flatten a finding into the FINDING_FIELDS columns (without the id)"""
+    extracted = record.get("extracted-results") or []
+    return [severity(record), record.get("template-id", ""), (record.get("info") or {}).get("name", ""),
+            record.get("host", ""), record.get("matched-at", ""), record.get("ip", ""), record.get("type", ""),
+            record.get("matcher-name", ""), ",".join(f"{e}" for e in extracted), record.get("timestamp", "")]
+
+
+class Runner:
+    """Run a nuclei command as a subprocess and parse its -jsonl findings as they are printed.
+
+    Findings are not kept: ``findings()`` yields them one by one while ``counts``
+    (per severity) and ``hosts`` (every scanned host with a finding) are updated.
+    """
+
+    def __init__(self, cmd, on_finding=None):
+        self.cmd = cmd
+        self.on_finding = on_finding
+        self.counts = dict.fromkeys(SEVERITIES, 0)
+        self.hosts = set()
+        self.returncode = None
+
+    def findings(self):
+        args = shlex.split(self.cmd, posix=platform.system() != "Windows")
+        with subprocess.Popen(args, stdout=subprocess.PIPE, text=True, encoding="utf-8", errors="replace",
+                              bufsize=1) as process:
+            try:
+                for line in process.stdout:
+                    record = parse_finding(line)
+                    if record is None:
+                        continue
+                    self.counts[severity(record)] += 1
+                    if record.get("host"):
+                        self.hosts.add(record["host"])
+                    if self.on_finding is not None:
+                        self.on_finding(record, self.counts)
+                    yield record
+            finally:
+                if process.poll() is None:
+                    process.terminate()
+                self.returncode = process.wait()
+
+
+def finding_key(record):
+    """Identity of a finding, used to merge results of shards that were scanned more than once"""
+    return (record.get("template-id"), record.get("matcher-name"), record.get("matched-at") or record.get("host"),
+            tuple(f"{e}" for e in record.get("extracted-results") or []))
+
+
+class ShardedRunner:
+    """Split a target list into shards and scan them with several nuclei processes in parallel.
+
+    ``build_cmd(target_file, output_file)`` returns the nuclei command for one shard
+    (e.g. ``Scan.multi_target``); ``extra_args`` such as rate limit and concurrency
+    flags are appended to it. Findings from all workers are merged, deduplicated and
+    written to ``output``. A shard whose process exits with an error is queued again,
+    up to ``max_attempts`` runs, and listed in ``failed`` if it never succeeds.
+    """
+
+    def __init__(self, build_cmd, target_file, shards=4, extra_args="", max_attempts=2, shard_dir="scan_shards",
+                 output="scan_result.jsonl", on_finding=None):
+        self.build_cmd = build_cmd
+        self.target_file = target_file
+        self.shards = max(1, int(shards))
+        self.extra_args = extra_args
+        self.max_attempts = max(1, int(max_attempts))
+        self.shard_dir = shard_dir
+        self.output = output
+        self.on_finding = on_finding
+        self.counts = dict.fromkeys(SEVERITIES, 0)
+        self.hosts = set()
+        self.failed = []
+
+    def _split(self):
+        with open(self.target_file, "r", encoding="utf-8") as f:
+            targets = [line.strip() for line in f if line.strip()]
+        count = min(self.shards, len(targets))
+        os.makedirs(self.shard_dir, exist_ok=True)
+        shard_files = []
+        # 轮流分配目标，避免响应慢的目标集中在同一个分片里
+        for n in range(count):
+            shard_file = os.path.join(self.shard_dir, f"shard-{n + 1}.txt")
+            with open(shard_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(targets[n::count]) + "\n")
+            shard_files.append(shard_file)
+        return shard_files
+
+    def _run_shard(self, shard_file, results):
+        cmd = self.build_cmd(shard_file, os.path.splitext(shard_file)[0] + ".jsonl")
+        if self.extra_args:
+            cmd = f"{cmd} {self.extra_args}"
+        runner = Runner(cmd)
+        try:
+            for record in runner.findings():
+                results.put(("finding", shard_file, record))
+        except Exception as e:
+            results.put(("done", shard_file, f"{e}"))
+            return
+        results.put(("done", shard_file, runner.returncode))
+
+    def findings(self):
+        shard_files = self._split()
+        results = queue.Queue()
+        attempts = dict.fromkeys(shard_files, 1)
+        seen = set()
+        outstanding = len(shard_files)
+        with ThreadPoolExecutor(max_workers=max(1, len(shard_files))) as executor, \
+                open(self.output, "w", encoding="utf-8") as out:
+            for shard_file in shard_files:
+                executor.submit(self._run_shard, shard_file, results)
+            while outstanding:
+                kind, shard_file, value = results.get()
+                if kind == "done":
+                    outstanding -= 1
+                    if value != 0:
+                        if attempts[shard_file] < self.max_attempts:
+                            attempts[shard_file] += 1
+                            outstanding += 1
+                            executor.submit(self._run_shard, shard_file, results)
+                        else:
+                            self.failed.append((shard_file, value))
+                    continue
+                key = finding_key(value)
+                if key in seen:
+                    continue
+                seen.add(key)
+                out.write(json.dumps(value, ensure_ascii=False) + "\n")
+                self.counts[severity(value)] += 1
+                if value.get("host"):
+                    self.hosts.add(value["host"])
+                if self.on_finding is not None:
+                    self.on_finding(value, self.counts)
+                yield value
 
 
 class Scan:
@@ -24,39 +188,39 @@ class Scan:
         else:
             self.path = None
 
-    def single_target(self, target, filename="scan_result.txt"):
+    def single_target(self, target, filename="scan_result.jsonl"):
         if "windows" in self.path:
-            self.cmd = "{} -u {} -o {} -nc".format(self.path, target, filename)
+            self.cmd = "{} -u {} -o {} -jsonl -nc".format(self.path, target, filename)
         else:
-            self.cmd = "{} -u {} -o {}".format(self.path, target, filename)
+            self.cmd = "{} -u {} -o {} -jsonl".format(self.path, target, filename)
         return self.cmd
 
-    def multi_target(self, target, filename="scan_result.txt"):
+    def multi_target(self, target, filename="scan_result.jsonl"):
         if "windows" in self.path:
-            self.cmd = "{} -l {} -o {} -nc".format(self.path, target, filename)
+            self.cmd = "{} -l {} -o {} -jsonl -nc".format(self.path, target, filename)
         else:
-            self.cmd = "{} -l {} -o {}".format(self.path, target, filename)
+            self.cmd = "{} -l {} -o {} -jsonl".format(self.path, target, filename)
         return self.cmd
 
-    def single_multi_target(self, target, key, value, filename="scan_result.txt"):
+    def single_multi_target(self, target, key, value, filename="scan_result.jsonl"):
         if "windows" in self.path:
-            self.cmd = "{} -{} {} -u {} -o {} -nc".format(self.path, key, value, target, filename)
+            self.cmd = "{} -{} {} -u {} -o {} -jsonl -nc".format(self.path, key, value, target, filename)
         else:
-            self.cmd = "{} -{} {} -u {} -o {}".format(self.path, key, value, target, filename)
+            self.cmd = "{} -{} {} -u {} -o {} -jsonl".format(self.path, key, value, target, filename)
         return self.cmd
 
-    def keyword_multi_target(self, target, key, value, filename="scan_result.txt"):
+    def keyword_multi_target(self, target, key, value, filename="scan_result.jsonl"):
         if "windows" in self.path:
-            self.cmd = "{} -{} {} -l {} -o {} -nc".format(self.path, key, value, target, filename)
+            self.cmd = "{} -{} {} -l {} -o {} -jsonl -nc".format(self.path, key, value, target, filename)
         else:
-            self.cmd = "{} -{} {} -l {} -o {}".format(self.path, key, value, target, filename)
+            self.cmd = "{} -{} {} -l {} -o {} -jsonl".format(self.path, key, value, target, filename)
         return self.cmd
 
-    def customize_cmd(self, target, customize_cmd, filename="scan_result.txt"):
+    def customize_cmd(self, target, customize_cmd, filename="scan_result.jsonl"):
         if "windows" in self.path:
-            self.cmd = "{} {} -l {} -o {} -nc".format(self.path, customize_cmd, target, filename)
+            self.cmd = "{} {} -l {} -o {} -jsonl -nc".format(self.path, customize_cmd, target, filename)
         else:
-            self.cmd = "{} {} -l {} -o {}".format(self.path, customize_cmd, target, filename)
+            self.cmd = "{} {} -l {} -o {} -jsonl".format(self.path, customize_cmd, target, filename)
         return self.cmd
 
     def update(self):
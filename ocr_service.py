@@ -0,0 +1,213 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+import pytesseract
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_BUCKET = 320  # 分组时图片尺寸向上取整的步长（像素）
+
+
+class OCRService:
+    """A persistent OCR worker holding a single, lazily loaded EasyOCR model.
+
+    Callers from any thread submit image paths; the worker groups pending images
+    into batches and runs them through the model together. Tesseract is used when
+    EasyOCR is disabled, fails to load, or finds no text.
+    """
+
+    def __init__(self, use_easyocr=True, languages=None, gpu=False, tesseract_cmd=None, tesseract_lang='eng',
+                 batch_size=8, batch_wait=0.05, max_side=1280, max_height=2160):
+        self.use_easyocr = use_easyocr
+        self.languages = languages or ['ch_sim', 'en']
+        self.gpu = gpu
+        self.tesseract_lang = tesseract_lang
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = batch_wait
+        self.max_side = max_side
+        self.max_height = max_height
+        self._reader = None
+        self._reader_failed = False
+        self._lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._thread = None
+
+        # Configure Tesseract OCR as fallback
+        if tesseract_cmd and os.path.exists(tesseract_cmd):
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+            logger.info(f"Using Tesseract OCR from: {tesseract_cmd}")
+        elif not use_easyocr:
+            logger.warning("Tesseract OCR path not found or not configured. OCR may not work properly.")
+
+    def _get_reader(self):
+        # 模型只在第一次真正需要识别时加载，整个进程共享同一个实例
+        if self._reader is None and self.use_easyocr and not self._reader_failed:
+            try:
+                import easyocr
+                logger.info(f"Initializing EasyOCR with languages: {self.languages} (GPU {'enabled' if self.gpu else 'disabled'})")
+                self._reader = easyocr.Reader(self.languages, gpu=self.gpu)
+                logger.info("EasyOCR initialized successfully")
+            except Exception as e:
+                logger.error(f"Error initializing EasyOCR: {e}")
+                self._reader_failed = True
+        return self._reader
+
+    def submit(self, image_path):
+        """Queue one image for recognition; the Future resolves to {'text', 'latency', 'ok'}.
+
+        ``ok`` is False when the image could not be read or no OCR engine worked, so an
+        empty text is a failure rather than an image without text.
+        """
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="ocr-service")
+                self._thread.start()
+        self._requests.put((image_path, future))
+        return future
+
+    def recognize(self, image_paths):
+        """Recognize a list of images and return their results in the same order"""
+        futures = [self.submit(path) for path in image_paths]
+        return [future.result() for future in futures]
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is _STOP:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    self._requests.put(_STOP)
+                    break
+                batch.append(request)
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"OCR error: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result({"text": "", "latency": 0.0, "ok": False})
+
+    def _load_image(self, image_path):
+        """Read an image as RGB, cropping very tall pages and downscaling large ones"""
+        # 验证图像文件
+        if not os.path.exists(image_path) or os.path.getsize(image_path) == 0:
+            logger.warning(f"Image file is missing or empty: {image_path}")
+            return None
+        img = cv2.imread(image_path)
+        if img is not None:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        else:
+            try:
+                # 尝试用PIL读取
+                img = np.array(Image.open(image_path).convert('RGB'))
+            except Exception as e:
+                logger.error(f"Failed to read image: {e}")
+                return None
+        if img.shape[0] > self.max_height:
+            img = img[:self.max_height]
+        scale = self.max_side / max(img.shape[:2])
+        if scale < 1:
+            img = cv2.resize(img, (int(img.shape[1] * scale), int(img.shape[0] * scale)),
+                             interpolation=cv2.INTER_AREA)
+        return img
+
+    def _process(self, batch):
+        started = time.monotonic()
+        loaded = []
+        for image_path, future in batch:
+            t0 = time.monotonic()
+            img = self._load_image(image_path)
+            if img is None:
+                future.set_result({"text": "", "latency": time.monotonic() - t0, "ok": False})
+            else:
+                loaded.append((image_path, future, img, time.monotonic() - t0))
+        if not loaded:
+            return
+
+        texts = [""] * len(loaded)
+        model_ok = False  # EasyOCR ran without error, so an empty text means the image has no text
+        reader = self._get_reader()
+        if reader is not None:
+            t0 = time.monotonic()
+            try:
+                # 按尺寸分组，同组图片补白到相同尺寸后一次性送入模型，避免小图标被补成整页大小
+                groups = {}
+                for n, (_, _, img, _) in enumerate(loaded):
+                    key = (-(-img.shape[0] // _BUCKET) * _BUCKET, -(-img.shape[1] // _BUCKET) * _BUCKET)
+                    groups.setdefault(key, []).append(n)
+                for (height, width), members in groups.items():
+                    canvases = []
+                    for n in members:
+                        img = loaded[n][2]
+                        canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+                        canvas[:img.shape[0], :img.shape[1]] = img
+                        canvases.append(canvas)
+                    results = reader.readtext_batched(canvases, batch_size=len(canvases))
+                    for n, result in zip(members, results):
+                        # 每个元素的格式是: [[坐标], 文本内容, 置信度]
+                        texts[n] = '\n'.join(text[1] for text in result)
+                model_ok = True
+            except Exception as e:
+                logger.error(f"EasyOCR error: {e}")
+            model_time = (time.monotonic() - t0) / len(loaded)
+        else:
+            model_time = 0.0
+
+        for n, (image_path, future, img, prep_time) in enumerate(loaded):
+            text = texts[n]
+            ok = True
+            t0 = time.monotonic()
+            if text:
+                logger.info(f"EasyOCR extracted {len(text)} characters from {image_path}")
+            else:
+                # 如果EasyOCR失败或未配置，回退到Tesseract
+                text = self._tesseract(image_path, img)
+                ok = text is not None or model_ok
+                text = text or ""
+            latency = prep_time + model_time + (time.monotonic() - t0)
+            logger.info(f"OCR latency for {image_path}: {latency * 1000:.0f} ms")
+            future.set_result({"text": text, "latency": latency, "ok": ok})
+        logger.info(f"OCR batch of {len(batch)} images finished in {time.monotonic() - started:.2f} seconds")
+
+    def _tesseract(self, image_path, img):
+        logger.info(f"Falling back to Tesseract OCR for {image_path}")
+        # 检查Tesseract配置
+        if not os.path.exists(pytesseract.pytesseract.tesseract_cmd):
+            logger.error(f"Tesseract OCR not properly configured. Path: {pytesseract.pytesseract.tesseract_cmd}")
+            return None
+        try:
+            text = pytesseract.image_to_string(img, lang=self.tesseract_lang)
+        except Exception as e:
+            logger.error(f"Tesseract error: {e}")
+            return None
+        if text.strip():
+            logger.info(f"Tesseract extracted {len(text.strip())} characters from {image_path}")
+        else:
+            logger.warning(f"Tesseract failed to extract text from {image_path}")
+        return text
+
+    def close(self):
+        with self._lock:
+            if self._thread is not None:
+                self._requests.put(_STOP)
+                self._thread.join()
+                self._thread = None
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class Stage:
+    """A single pipeline stage: a function applied by its own pool of worker threads.
+
+    With ``batch_size`` > 1 the function receives a list of up to that many items,
+    collected for at most ``batch_wait`` seconds, and must return a list of the
+    same length.
+    """
+
+    def __init__(self, name, func, workers=1, on_error=None, batch_size=1, batch_wait=0.5):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.on_error = on_error
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = batch_wait
+
+
+class Pipeline:
+    """Run items through a chain of stages connected by bounded queues.
+
+    Every stage has its own worker pool, so stages overlap and the total wall time
+    is set by the slowest stage. Results are handed to the sink in input order.
+    """
+
+    def __init__(self, stages, queue_size=32):
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+
+    def _worker(self, stage, in_q, out_q, state, cancel):
+        try:
+            stopping = False
+            while not stopping:
+                entry = in_q.get()
+                if entry is _STOP:
+                    break
+                batch = [entry]
+                deadline = time.monotonic() + stage.batch_wait
+                while len(batch) < stage.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        entry = in_q.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if entry is _STOP:
+                        stopping = True
+                        break
+                    batch.append(entry)
+                if cancel.is_set():
+                    continue  # 结果处理出错后丢弃剩余条目，只等待结束标记
+                for result in self._apply(stage, batch):
+                    out_q.put(result)
+        finally:
+            in_q.put(_STOP)  # let sibling workers see the sentinel too
+            with state["lock"]:
+                state["alive"] -= 1
+                last = state["alive"] == 0
+            if last:
+                out_q.put(_STOP)
+
+    def _apply(self, stage, batch):
+        indexes = [index for index, _ in batch]
+        items = [item for _, item in batch]
+        try:
+            if stage.batch_size > 1:
+                results = stage.func(items)
+                if len(results) != len(items):
+                    raise ValueError(f"batch function returned {len(results)} results for {len(items)} items")
+            else:
+                results = [stage.func(items[0])]
+        except Exception as e:
+            logger.error(f"Stage '{stage.name}' failed on item(s) {indexes}: {e}")
+            results = [self._recover(stage, item, e) for item in items]
+        return list(zip(indexes, results))
+
+    @staticmethod
+    def _recover(stage, item, error):
+        """Apply the stage's error handler; if there is none or it fails, pass the item through unchanged"""
+        if not stage.on_error:
+            return item
+        try:
+            return stage.on_error(item, error)
+        except Exception as e:
+            logger.error(f"Error handler of stage '{stage.name}' failed: {e}")
+            return item
+
+    def _feed(self, items, out_q, cancel):
+        try:
+            for index, item in enumerate(items):
+                if cancel.is_set():
+                    break
+                out_q.put((index, item))
+        finally:
+            out_q.put(_STOP)
+
+    def run(self, items, sink, on_complete=None):
+        """Push items through all stages and call sink(index, item) in input order.
+
+        ``on_complete(index, item)`` is called as soon as an item leaves the last
+        stage, before it waits in the reorder buffer for earlier items. If the
+        sink or ``on_complete`` raises, the remaining items are discarded, all
+        worker threads are stopped and the exception is re-raised.
+        """
+        cancel = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0], cancel), daemon=True,
+                                    name="pipeline-feed")]
+        for n, stage in enumerate(self.stages):
+            state = {"lock": threading.Lock(), "alive": stage.workers}
+            for w in range(stage.workers):
+                threads.append(threading.Thread(target=self._worker,
+                                                args=(stage, queues[n], queues[n + 1], state, cancel),
+                                                daemon=True, name=f"pipeline-{stage.name}-{w}"))
+        for t in threads:
+            t.start()
+
+        # 按输入顺序输出结果，先完成的结果暂存在重排缓冲区中
+        pending = {}
+        next_index = 0
+        out_q = queues[-1]
+        finished = False
+        try:
+            while True:
+                entry = out_q.get()
+                if entry is _STOP:
+                    finished = True
+                    break
+                index, item = entry
+                if on_complete is not None:
+                    on_complete(index, item)
+                pending[index] = item
+                while next_index in pending:
+                    sink(next_index, pending.pop(next_index))
+                    next_index += 1
+            for index in sorted(pending):
+                sink(index, pending.pop(index))
+        except BaseException:
+            # 停止输入并排空最后一个队列，让阻塞在队列上的线程都能退出
+            cancel.set()
+            while not finished and out_q.get() is not _STOP:
+                pass
+            raise
+        finally:
+            for t in threads:
+                t.join()
+
+
+class BackgroundLoop:
+    """An asyncio event loop running in its own thread, so stage workers can await coroutines"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="pipeline-loop")
+        self._thread.start()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the background loop and block until it finishes"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
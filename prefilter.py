@@ -0,0 +1,126 @@
+import re
+
+# 常见的默认页面/错误页面特征，这类页面不可能属于目标公司
+DEFAULT_PAGE_MARKERS = [
+    "welcome to nginx",
+    "welcome to openresty",
+    "iis windows server",
+    "internet information services",
+    "apache2 ubuntu default page",
+    "apache2 debian default page",
+    "test page for the apache",
+    "it works!",
+    "welcome to centos",
+    "tomcat/",
+    "403 forbidden",
+    "404 not found",
+    "502 bad gateway",
+    "503 service unavailable",
+    "default web site page",
+    "domain has expired",
+    "this domain is for sale",
+]
+
+# 公司名称常见后缀，去掉后得到更短的品牌名用于匹配
+COMPANY_SUFFIXES = ["股份有限公司", "有限责任公司", "有限公司", "集团", "公司",
+                    " co., ltd.", " co.,ltd.", " co., ltd", " inc.", " inc", " ltd.", " ltd", " corporation", " corp."]
+
+_ICP_LINE = re.compile(r"[^\n]{0,60}ICP[备证][^\n]{0,60}", re.I)
+_COPYRIGHT_LINE = re.compile(r"(?:©|copyright|版权所有)[^\n]{0,80}", re.I)
+
+
+def company_variants(target_company, aliases=()):
+    """The company name, its aliases and their short forms without legal suffixes"""
+    variants = set()
+    for name in [target_company, *aliases]:
+        name = f"{name}".strip().lower()
+        if not name:
+            continue
+        variants.add(name)
+        short = name
+        for suffix in COMPANY_SUFFIXES:
+            if short.endswith(suffix):
+                short = short[:-len(suffix)].strip()
+        if len(short) >= 2:
+            variants.add(short)
+    return sorted(variants, key=len, reverse=True)
+
+
+class PreFilter:
+    """Rule/keyword scoring that decides obvious hosts locally before the LLM stage.
+
+    Hosts scoring at or above ``positive_threshold`` are accepted, hosts at or below
+    ``negative_threshold`` are rejected, and only the band in between goes to the LLM.
+    """
+
+    def __init__(self, target_company, aliases=(), positive_threshold=80, negative_threshold=-50):
+        self.variants = company_variants(target_company, aliases)
+        self.positive_threshold = positive_threshold
+        self.negative_threshold = negative_threshold
+
+    def _find(self, text):
+        text = f"{text or ''}".lower()
+        return [name for name in self.variants if name in text]
+
+    def score(self, content, rendered=True):
+        """Return (score, reasons, identifiers) for a fetched page.
+
+        Until the page has been rendered and OCR'd (``rendered=False``) an empty page
+        is not penalised, since its content may come from scripts or images.
+        """
+        score = 0
+        reasons = []
+        identifiers = set()
+        title = f"{content.get('title') or ''}".strip()
+        source = content.get("source_code", "")
+        page_text = content.get("page_text", "")
+        ocr_text = content.get("ocr_text", "")
+
+        found = self._find(title)
+        if found:
+            score += 60
+            identifiers.update(found)
+            reasons.append(f"company name in title ({found[0]})")
+        for pattern, label, weight in ((_ICP_LINE, "ICP filing", 50), (_COPYRIGHT_LINE, "copyright line", 50)):
+            lines = pattern.findall(page_text or source)
+            found = [name for line in lines for name in self._find(line)]
+            if found:
+                score += weight
+                identifiers.update(found)
+                reasons.append(f"company name in {label} ({found[0]})")
+        found = self._find(page_text)
+        if found:
+            score += 30
+            identifiers.update(found)
+            reasons.append("company name in page text")
+        found = self._find(ocr_text)
+        if found:
+            score += 20
+            identifiers.update(found)
+            reasons.append("company name in image text")
+
+        head = f"{title} {page_text[:500]}".lower()
+        marker = next((m for m in DEFAULT_PAGE_MARKERS if m in head), None)
+        if marker and not identifiers:
+            score -= 100
+            reasons.append(f"default or error page ({marker})")
+        if rendered and title in ("", "No title") and len(page_text) < 50 and not ocr_text.strip() and not identifiers:
+            score -= 60
+            reasons.append("empty title and almost no text")
+        return score, reasons, sorted(identifiers)
+
+    def evaluate(self, content, rendered=True):
+        """Return a verdict dict when the score is decisive, otherwise None"""
+        score, reasons, identifiers = self.score(content, rendered)
+        if score >= self.positive_threshold:
+            belongs = True
+        elif score <= self.negative_threshold:
+            belongs = False
+        else:
+            return None
+        return {
+            "belongs_to_target": belongs,
+            "confidence": min(100, abs(score)),
+            "reasoning": f"Decided by local pre-filter (score {score}): " + "; ".join(reasons),
+            "company_identifiers_found": identifiers,
+        }
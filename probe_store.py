@@ -0,0 +1,75 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ProbeStore:
+    """SQLite store of liveness probe results (status, title, headers, body, TLS info) keyed by URL.
+
+    FastCheck writes to it while checking targets, and later stages such as the
+    website analyzer read the stored page instead of fetching the URL again.
+    """
+
+    def __init__(self, path=os.path.join('output', 'probe_store.sqlite'), ttl=86400, commit_every=200):
+        self.ttl = ttl
+        self.commit_every = commit_every
+        self.hits = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS probes (url TEXT PRIMARY KEY, status TEXT, probe TEXT, "
+                         "body TEXT, updated REAL)")
+        self._db.commit()
+
+    def put(self, url, probe, body=None):
+        """Store one probe; writes are committed in groups of ``commit_every``"""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?)",
+                             (url, f"{probe.get('status', '')}", json.dumps(probe, ensure_ascii=False), body,
+                              time.time()))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._db.commit()
+                self._pending = 0
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+            self._pending = 0
+
+    def get(self, url):
+        """Return the stored probe for a URL (with its body under 'body'), or None when missing or expired"""
+        with self._lock:
+            row = self._db.execute("SELECT probe, body FROM probes WHERE url = ? AND updated > ?",
+                                   (url, time.time() - self.ttl)).fetchone()
+        if row is None:
+            return None
+        probe = json.loads(row[0])
+        probe["body"] = row[1]
+        return probe
+
+    def lookup(self, host):
+        """Return the first stored probe with status 200 for a host (trying http and https) or URL.
+
+        The probed URL is returned under 'url'.
+        """
+        if host.startswith(('http://', 'https://')):
+            urls = [host]
+        else:
+            urls = [f"http://{host}", f"https://{host}"]
+        for url in urls:
+            probe = self.get(url)
+            if probe is not None and f"{probe.get('status')}" == "200" and probe.get("body") is not None:
+                with self._lock:
+                    self.hits += 1
+                probe["url"] = url
+                return probe
+        return None
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class QueryCache:
+    """Persistent cache of raw FOFA API responses.
+
+    Entries are keyed by the API path and the query parameters that determine the
+    result (for searches: qbase64, page, fields, size and full); the account
+    credentials are not part of the key. Entries older than ``ttl`` seconds are
+    ignored and overwritten on the next request.
+    """
+
+    def __init__(self, path=os.path.join('output', 'fofa_cache.sqlite'), ttl=86400):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, api TEXT, params TEXT, "
+                         "response TEXT, created REAL)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(api, param):
+        params = {k: f"{v}" for k, v in param.items() if k not in ("email", "key")}
+        params = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(f"{api}\x00{params}".encode("utf-8")).hexdigest(), params
+
+    def get(self, api, param):
+        key, _ = self.make_key(api, param)
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ? AND created > ?",
+                                   (key, time.time() - self.ttl)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, api, param, response):
+        key, params = self.make_key(api, param)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                             (key, api, params, response, time.time()))
+            self._db.commit()
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
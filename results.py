@@ -0,0 +1,146 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def parse_key_fields(value):
+    """Split a comma separated key_fields setting, ignoring blanks"""
+    return [f.strip() for f in f"{value or ''}".split(",") if f.strip()]
+
+
+def dedupe(rows, fields, key_fields=None):
+    """Remove duplicate rows in one pass, keeping the first occurrence and the original order.
+
+    ``fields`` names the columns of each row (a comma separated string or a list).
+    Rows are compared on ``key_fields`` only (e.g. ["host", "port"]); when it is
+    empty, or names a column that is not present, the whole row is the key.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    key_fields = key_fields or []
+    try:
+        indexes = [fields.index(f) for f in key_fields]
+    except ValueError:
+        indexes = []
+    seen = set()
+    unique = []
+    for row in rows:
+        if isinstance(row, (list, tuple)):
+            key = tuple(row[i] for i in indexes) if indexes else tuple(row)
+        else:
+            key = row
+        try:
+            duplicate = key in seen
+        except TypeError:  # 字段值中含有列表等不可哈希的类型
+            key = repr(key)
+            duplicate = key in seen
+        if not duplicate:
+            seen.add(key)
+            unique.append(row)
+    return unique
+
+
+class ResultSet:
+    """Columnar container for FOFA results: a DataFrame of object columns with named fields.
+
+    Iterating yields plain row tuples, so writers that expect rows (exporter,
+    out_file_scan) can consume it directly, while filters work on whole columns.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    @classmethod
+    def from_rows(cls, rows, fields):
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        # 只查询一个字段时FOFA返回的是字符串列表而不是二维列表
+        rows = [row if isinstance(row, (list, tuple)) else [row] for row in rows]
+        return cls(pd.DataFrame(rows, columns=list(fields), dtype=object))
+
+    @classmethod
+    def concat(cls, result_sets):
+        frames = [r.frame for r in result_sets if len(r)]
+        if not frames:
+            return result_sets[0] if result_sets else cls(pd.DataFrame(dtype=object))
+        # 字段不同的结果集合并时缺失的单元格为NaN，填充为空字符串，导出时才能写入Excel
+        return cls(pd.concat(frames, ignore_index=True).fillna(""))
+
+    @property
+    def fields(self):
+        return list(self.frame.columns)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __iter__(self):
+        return self.frame.itertuples(index=False, name=None)
+
+    def column(self, name):
+        return self.frame[name]
+
+    def filter(self, mask):
+        return ResultSet(self.frame[mask].reset_index(drop=True))
+
+    def with_column(self, name, values):
+        frame = self.frame.copy(deep=False)
+        frame[name] = pd.Series(values, index=frame.index, dtype=object)
+        return ResultSet(frame)
+
+    def dedupe(self, key_fields=None):
+        """Hash-based dedup on ``key_fields`` (whole row when empty or not all present)"""
+        subset = list(key_fields or [])
+        if not subset or any(f not in self.frame.columns for f in subset):
+            subset = None
+        try:
+            mask = ~self.frame.duplicated(subset=subset)
+        except TypeError:  # 字段值中含有列表等不可哈希的类型
+            return ResultSet.from_rows(dedupe(list(self), self.fields, key_fields), self.fields)
+        return self.filter(mask)
+
+
+class KeywordFilter:
+    """Case-insensitive multi-keyword filter compiled once and applied to a whole result set.
+
+    Each keyword is a regular expression; a row matches when any keyword is found
+    in any of its cells. Every cell is searched on its own, so a pattern never
+    spans two cells. ``counts`` accumulates the number of matching rows per
+    keyword over every result set passed to ``match``.
+
+    Matching still runs Python's ``re`` once per keyword and distinct cell value,
+    so mostly-unique columns cost roughly a second per 100k rows; see
+    benchmarks/bench_keyword.py.
+    """
+
+    def __init__(self, keywords):
+        if isinstance(keywords, str):
+            keywords = keywords.split(",")
+        self.keywords = [k for k in keywords if k]
+        self.patterns = [re.compile(k, re.I) for k in self.keywords]
+        self.counts = dict.fromkeys(self.keywords, 0)
+
+    @staticmethod
+    def text_columns(result_set):
+        """Return every column as (codes, distinct values); empty cells (None/NaN) become "" so they never match"""
+        columns = []
+        for c in result_set.frame.columns:
+            codes, uniques = pd.factorize(result_set.frame[c].fillna("").astype(str))
+            columns.append((codes, pd.Series(uniques, dtype=object)))
+        return columns
+
+    def match(self, result_set):
+        """Return the rows of ``result_set`` containing at least one keyword"""
+        if not len(result_set):
+            return result_set
+        columns = self.text_columns(result_set)
+        mask = np.zeros(len(result_set), dtype=bool)
+        for keyword, pattern in zip(self.keywords, self.patterns):
+            found = np.zeros(len(result_set), dtype=bool)
+            # 协议、端口、国家等列重复值很多，每个不同的值只匹配一次，再按编码映射回各行
+            for codes, uniques in columns:
+                hits = uniques.str.contains(pattern, regex=True, na=False).to_numpy(dtype=bool)
+                found |= hits[codes]
+            self.counts[keyword] += int(found.sum())
+            mask |= found
+        return result_set.filter(mask)
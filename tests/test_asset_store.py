@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from asset_store import AssetStore, row_fingerprint  # noqa: E402
+
+
+def test_field_list_change_is_not_a_change(tmp_path):
+    store = AssetStore(str(tmp_path / "assets.sqlite"))
+    try:
+        short = ["host", "protocol"]
+        full = ["host", "protocol", "title", "lastupdatetime"]
+        assert store.observe([("a.com:80", row_fingerprint(short, ["a.com", "http"]))]) == {"a.com:80"}
+        # -s 查询与完整字段查询交替执行不应把资产标记为变化
+        assert store.observe([("a.com:80", row_fingerprint(full, ["a.com", "http", "A", "2026-01-01"]))]) == set()
+        # lastupdatetime 不参与指纹
+        assert store.observe([("a.com:80", row_fingerprint(full, ["a.com", "http", "A", "2026-02-01"]))]) == set()
+        assert store.observe([("a.com:80", row_fingerprint(full, ["a.com", "http", "B", "2026-02-01"]))]) == {"a.com:80"}
+    finally:
+        store.close()
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import fofa  # noqa: E402
+
+
+class FakeFofa(BaseHTTPRequestHandler):
+    failures = {}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/api/v1/info/my":
+            body = {"error": False, "email": query["email"][0]}
+        else:
+            page = int(query["page"][0])
+            # 每页第一次请求返回503，验证退避重试
+            if self.failures.get(page, 0) < 1:
+                self.failures[page] = self.failures.get(page, 0) + 1
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = {"error": False, "size": 30, "results": [[f"10.0.0.{page}:80", "http"]]}
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_async_client_fetches_pages_with_retries(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeFofa)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "fofa.ini").write_text("[userinfo]\nemail = a@b.c\nkey = k\n[size]\nsize = 10\n[full]\nfull = false\n"
+                                           "[concurrency]\nrate = 20\n[client]\nbackoff = 0.01\n[cache]\ncache = off\n",
+                                           encoding="utf-8")
+        (tmp_path / fofa.ENDPOINT_CACHE).write_text(json.dumps({"base_url": base_url, "checked": time.time()}),
+                                                    encoding="utf-8")
+        client = fofa.Client()
+
+        async def fetch():
+            async with fofa.AsyncClient(client) as async_client:
+                return await asyncio.gather(*(async_client.get_data('app="x"', page=page, fields="host,protocol")
+                                              for page in (1, 2, 3)))
+
+        pages = asyncio.run(fetch())
+        assert [data["results"] for data in pages] == [[["10.0.0.1:80", "http"]], [["10.0.0.2:80", "http"]],
+                                                       [["10.0.0.3:80", "http"]]]
+        assert FakeFofa.failures == {1: 1, 2: 1, 3: 1}
+    finally:
+        server.shutdown()
+        server.server_close()
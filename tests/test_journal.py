@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from journal import Journal  # noqa: E402
+
+
+def write_run(path, numbers, torn=None):
+    """Append records for ``numbers`` like run_analysis does, optionally ending with a torn record"""
+    with Journal(path).open() as journal:
+        for no in numbers:
+            journal.write(no, {"no": no, "ip": f"10.0.0.{no}"})
+    if torn is not None:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f'{{"no": {torn}, "result": {{"no": {torn}, "ip"')
+
+
+def test_resume_from_torn_journal_twice(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    write_run(path, [1, 2, 3], torn=4)
+    assert sorted(Journal(path).load()) == [1, 2, 3]
+
+    # 第一次续跑：残缺的第4条被截掉，新记录从新的一行开始
+    write_run(path, [4, 5], torn=6)
+    assert sorted(Journal(path).load()) == [1, 2, 3, 4, 5]
+
+    # 第二次续跑：之前续跑写入的记录全部保留且可解析
+    write_run(path, [6, 7])
+    assert sorted(Journal(path).load()) == [1, 2, 3, 4, 5, 6, 7]
+    with open(path, encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 7
+
+
+def test_open_keeps_complete_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    write_run(path, [1, 2])
+    write_run(path, [3])
+    assert sorted(Journal(path).load()) == [1, 2, 3]
+
+
+def test_torn_only_record_is_dropped(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"no": 1, "res')
+    write_run(path, [1])
+    assert Journal(path).load() == {1: {"no": 1, "ip": "10.0.0.1"}}
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import openpyxl
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import exporter  # noqa: E402
+from results import ResultSet  # noqa: E402
+
+
+def test_concat_mismatched_fields_exports(tmp_path):
+    hosts = ResultSet.from_rows([["a.example.com", "443"], ["b.example.com", "80"]], "host,port")
+    error = ResultSet.from_rows(["[-] 规则不存在"], "Error")
+    titled = ResultSet.from_rows([["c.example.com", "login"]], "host,title")
+    merged = ResultSet.concat([hosts, error, titled])
+    assert merged.fields == ["host", "port", "Error", "title"]
+    assert not merged.frame.isna().any().any()
+
+    filename = str(tmp_path / "merged.xlsx")
+    exporter.write_excel(filename, {"merged": merged}, merged.fields)
+    rows = list(openpyxl.load_workbook(filename).active.iter_rows(values_only=True))
+    assert rows[0] == ("host", "port", "Error", "title")
+    assert rows[1] == ("a.example.com", "443", None, None)
+    assert rows[4] == ("c.example.com", None, None, "login")
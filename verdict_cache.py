@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+# 随机数、时间戳、会话ID等每次请求都会变化的内容不参与指纹计算
+_VOLATILE = re.compile(r"\b(?=[0-9a-f]*\d)[0-9a-f]{8,}\b")
+_SPACES = re.compile(r"\s+")
+
+
+class VerdictCache:
+    """Persistent cache of LLM verdicts keyed by a normalized page fingerprint.
+
+    Hosts serving the same page (vendor appliances, load-balanced clusters) share
+    one verdict, and identical requests that are in flight at the same time are
+    coalesced so only one of them reaches the API.
+    """
+
+    def __init__(self, path=os.path.join('output', 'verdict_cache.sqlite'), ttl=7 * 86400):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS verdicts (fingerprint TEXT PRIMARY KEY, verdict TEXT, created REAL)")
+        self._db.commit()
+
+    @staticmethod
+    def normalize(text):
+        text = f"{text or ''}".lower()
+        text = _VOLATILE.sub("", text)
+        return _SPACES.sub(" ", text).strip()
+
+    @classmethod
+    def fingerprint(cls, target_company, model, title, ocr_text, page_text, mode=None):
+        """Fingerprint of the evidence a verdict was based on.
+
+        ``mode`` separates verdicts produced from less evidence (e.g. "batch") from
+        full single-host verdicts, so the weaker ones are never reused in their place.
+        """
+        parts = [cls.normalize(part) for part in (target_company, model, title, ocr_text, page_text)]
+        if mode:
+            parts.append(mode)
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, fingerprint):
+        with self._lock:
+            row = self._db.execute("SELECT verdict FROM verdicts WHERE fingerprint = ? AND created > ?",
+                                   (fingerprint, time.time() - self.ttl)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, fingerprint, verdict):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?)",
+                             (fingerprint, json.dumps(verdict, ensure_ascii=False), time.time()))
+            self._db.commit()
+
+    def lookup(self, fingerprint):
+        """Like get(), but counts a hit when the verdict is found"""
+        verdict = self.get(fingerprint)
+        if verdict is not None:
+            with self._lock:
+                self.hits += 1
+        return verdict
+
+    def record(self, fingerprint, verdict):
+        """Store a verdict that was computed outside get_or_compute, counting it as a miss"""
+        with self._lock:
+            self.misses += 1
+        self.put(fingerprint, verdict)
+
+    def get_or_compute(self, fingerprint, compute):
+        """Return (verdict, source) where source is 'cache', 'coalesced' or 'llm'.
+
+        ``compute`` returns (verdict, ok); only verdicts with ok=True are stored.
+        """
+        verdict = self.get(fingerprint)
+        if verdict is not None:
+            with self._lock:
+                self.hits += 1
+            return verdict, "cache"
+        with self._lock:
+            future = self._inflight.get(fingerprint)
+            owner = future is None
+            if owner:
+                future = self._inflight[fingerprint] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result(), "coalesced"
+        try:
+            verdict, ok = compute()
+            if ok:
+                self.put(fingerprint, verdict)
+            future.set_result(verdict)
+            return verdict, "llm"
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(fingerprint, None)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,26 +1,28 @@
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
-from openai import OpenAI
 import argparse
 import time
 import sys
 import logging
 import json
+import csv
 import os
+import shutil
 from urllib.parse import urlparse, urljoin
 import config
-import cv2
-import pytesseract
-import easyocr
-from PIL import Image
-from io import BytesIO
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-import numpy as np
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from datetime import datetime
+from browser_pool import BrowserPool
+from ocr_service import OCRService
+from image_cache import ImageCache
+from verdict_cache import VerdictCache
+from probe_store import ProbeStore
+from journal import Journal
+from asset_store import AssetStore, asset_key
+from llm_dispatcher import LLMDispatcher
+from prefilter import PreFilter
+from pipeline import BackgroundLoop, Pipeline, Stage
+from fastcheck import AsyncFetcher
 
 # Configure logging
 logging.basicConfig(
@@ -33,38 +35,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize OCR readers
-ocr_reader = None
-if hasattr(config, 'use_easyocr') and config.use_easyocr:
-    try:
-        logger.info(f"Initializing EasyOCR with languages: {config.easyocr_languages} (GPU disabled)")
-        
-        ocr_reader = easyocr.Reader(
-            config.easyocr_languages if hasattr(config, 'easyocr_languages') else ['ch_sim', 'en'],
-            gpu=False  # 强制不使用GPU
-        )
-        logger.info("EasyOCR initialized successfully")
-    except Exception as e:
-        logger.error(f"Error initializing EasyOCR: {e}")
-else:
-    # Configure Tesseract OCR as fallback
-    if hasattr(config, 'tesseract_cmd') and os.path.exists(config.tesseract_cmd):
-        pytesseract.pytesseract.tesseract_cmd = config.tesseract_cmd
-        logger.info(f"Using Tesseract OCR from: {config.tesseract_cmd}")
-    else:
-        logger.warning("Tesseract OCR path not found or not configured. OCR may not work properly.")
+# Files kept in a run's output directory so an interrupted run can be resumed
+RUN_FILE = 'run.json'
+JOURNAL_FILE = 'journal.jsonl'
+# Columns of the results sheet, streamed to CSV in input order while the run is in progress
+RESULT_FIELDS = ["ip", "url", "accessible", "title", "belongs_to_target", "confidence", "reasoning", "identifiers",
+                 "decided_by", "screenshot_path", "ocr_text"]
+
 
 class WebsiteAnalyzer:
     def __init__(self, output_dir=None):
-        # Configure OpenAI client
-        self.client = OpenAI(
+        # Configure the rate-limited OpenAI dispatcher
+        self.llm = LLMDispatcher(
             api_key=config.openai_key,
             base_url=config.api_base,
+            max_concurrency=getattr(config, 'llm_concurrency', 8),
+            requests_per_min=getattr(config, 'llm_requests_per_min', 60),
+            tokens_per_min=getattr(config, 'llm_tokens_per_min', 90000),
+            max_retries=getattr(config, 'llm_max_retries', 5)
         )
         self.model = config.model
         self.timeout = config.timeout
         self.max_retries = config.max_retries
         
+        # Pipeline concurrency per stage
+        self.fetch_workers = getattr(config, 'fetch_workers', 16)
+        self.render_workers = getattr(config, 'render_workers', 1)
+        self.ocr_workers = getattr(config, 'ocr_workers', 1)
+        self.llm_workers = getattr(config, 'llm_workers', 4)
+        self.queue_size = getattr(config, 'pipeline_queue_size', 32)
+        self.llm_batch_size = getattr(config, 'llm_batch_size', 1)  # hosts per LLM request, 1 disables batching
+        self.prefilter = None
+        
+        # Shared aiohttp fetcher with pooled keep-alive connections, driven from a background event loop
+        self.fetcher = AsyncFetcher(
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            concurrency=getattr(config, 'http_concurrency', 64),
+            per_host=getattr(config, 'http_per_host', 4)
+        )
+        self._loop = BackgroundLoop()
+        
+        # OCR model is loaded lazily on the first image and shared by all OCR workers
+        self.ocr = OCRService(
+            use_easyocr=getattr(config, 'use_easyocr', False),
+            languages=getattr(config, 'easyocr_languages', ['ch_sim', 'en']),
+            gpu=getattr(config, 'use_gpu', False),
+            tesseract_cmd=getattr(config, 'tesseract_cmd', None),
+            tesseract_lang=getattr(config, 'tesseract_lang', 'eng'),
+            batch_size=getattr(config, 'ocr_batch_size', 8),
+            max_side=getattr(config, 'ocr_max_side', 1280)
+        )
+        # Persistent LLM verdict cache; identical in-flight prompts are coalesced into one request
+        self.verdict_cache = VerdictCache(
+            path=getattr(config, 'verdict_cache_path', os.path.join('output', 'verdict_cache.sqlite')),
+            ttl=getattr(config, 'verdict_cache_days', 7) * 86400
+        )
+        # Image/OCR cache shared across runs, keyed by the SHA-256 of the image bytes
+        self.image_cache = ImageCache(
+            cache_dir=getattr(config, 'image_cache_dir', os.path.join('output', 'image_cache')),
+            max_bytes=getattr(config, 'image_cache_max_mb', 512) * 1024 * 1024
+        )
+        # Pages already fetched by the FastCheck liveness probe are reused instead of fetched again
+        self.probe_store = ProbeStore(
+            path=getattr(config, 'probe_store_path', os.path.join('output', 'probe_store.sqlite')),
+            ttl=getattr(config, 'probe_store_hours', 24) * 3600
+        ) if getattr(config, 'reuse_probes', True) else None
+        
         # Setup output directory with timestamp
         if output_dir:
             self.output_dir = output_dir
@@ -81,41 +118,20 @@ class WebsiteAnalyzer:
         self.setup_browser()
 
     def setup_browser(self):
-        """Setup headless browser for screenshots and rendering"""
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        
-        # 忽略SSL证书错误
-        chrome_options.add_argument("--ignore-certificate-errors")
-        chrome_options.add_argument("--ignore-ssl-errors")
-        chrome_options.add_argument("--allow-insecure-localhost")
-        chrome_options.add_argument("--allow-running-insecure-content")
-        chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        
+        """Setup the pool of headless browsers for screenshots and rendering"""
+        self.browser_pool = BrowserPool(
+            size=self.render_workers,
+            max_pages=getattr(config, 'browser_recycle_pages', 50),
+            driver_path=config.chrome_driver_path,
+            page_load_timeout=getattr(config, 'page_load_timeout', 15),
+            idle_time=getattr(config, 'network_idle_time', 0.5)
+        )
         try:
-            # 使用配置文件中指定的ChromeDriver路径
-            if os.path.exists(config.chrome_driver_path):
-                logger.info(f"Using ChromeDriver from: {config.chrome_driver_path}")
-                service = Service(executable_path=config.chrome_driver_path)
-                self.driver = webdriver.Chrome(
-                    service=service,
-                    options=chrome_options
-                )
-            else:
-                # 如果指定路径不存在，尝试自动下载
-                logger.warning(f"ChromeDriver not found at: {config.chrome_driver_path}, trying automatic download")
-                self.driver = webdriver.Chrome(
-                    service=Service(ChromeDriverManager().install()),
-                    options=chrome_options
-                )
-            logger.info("Browser setup successful")
+            self.browser_pool.start()
+            logger.info(f"Browser setup successful ({self.render_workers} workers)")
         except Exception as e:
             logger.error(f"Browser setup failed: {e}")
-            self.driver = None
+            self.browser_pool = None
 
     def read_excel(self, file_path):
         """Read IP addresses from an Excel file."""
@@ -138,221 +154,220 @@ class WebsiteAnalyzer:
 
     def get_website_content(self, ip):
         """Fetch website content from an IP address and take screenshot."""
-        # Check if the IP/host already includes protocol
-        if ip.startswith(('http://', 'https://')):
-            urls = [ip]  # Already has protocol, use as is
-        else:
-            urls = [f"http://{ip}", f"https://{ip}"]  # Add protocols
-            
+        content, url = self.fetch_page(ip)
+        if url and self.browser_pool:
+            content = self.capture_visual_data(url, content, urlparse(url).netloc)
+        return content, url
+
+    def fetch_page(self, ip):
+        """Fetch the page source and title from an IP address without rendering it."""
+        logger.info(f"Attempting to fetch {ip}")
         content = {
             "source_code": "", 
             "title": "", 
             "status_code": None,
             "screenshot_path": None,
             "images": [],
-            "ocr_text": ""
+            "ocr_text": "",
+            "page_text": ""
         }
         
-        for url in urls:
-            for attempt in range(self.max_retries):
-                try:
-                    logger.info(f"Attempting to fetch {url} (Attempt {attempt+1}/{self.max_retries})")
-                    
-                    # Basic request to get source code
-                    response = requests.get(url, timeout=self.timeout, verify=False)
-                    content["status_code"] = response.status_code
-                    
-                    if response.status_code == 200:
-                        content["source_code"] = response.text
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        content["title"] = soup.title.string if soup.title else "No title"
-                        
-                        # Save the source code for inspection
-                        domain = urlparse(url).netloc
-                        source_file = os.path.join(self.output_dir, 'reports', f"{domain}_source.html")
-                        with open(source_file, 'w', encoding='utf-8') as f:
-                            f.write(content["source_code"])
-                        logger.info(f"Source code saved to {source_file}")
-                        
-                        # Get screenshot and extract text from images if browser setup was successful
-                        if self.driver:
-                            content = self.capture_visual_data(url, content, domain)
-                        
-                        return content, url
-                    break
-                except requests.RequestException as e:
-                    logger.warning(f"Request error for {url}: {e}")
-                    if attempt == self.max_retries - 1:
-                        logger.error(f"Failed to connect to {url} after {self.max_retries} attempts")
-                    time.sleep(1)
-                    continue
+        probe = self.probe_store.lookup(ip) if self.probe_store is not None else None
+        if probe is not None:
+            logger.info(f"Reusing liveness probe result for {ip}")
+            response = {"url": probe["url"], "status": 200, "text": probe["body"]}
+        else:
+            try:
+                response = self._loop.run(self.fetcher.fetch(ip))
+            except Exception as e:
+                logger.warning(f"Request error for {ip}: {e}")
+                response = None
+        if response is None:
+            logger.error(f"Failed to connect to {ip} after {self.max_retries} attempts")
+            return content, None
+        
+        url = response["url"]
+        content["status_code"] = response["status"]
+        if response["status"] == 200:
+            content["source_code"] = response["text"]
+            soup = BeautifulSoup(response["text"], 'html.parser')
+            content["title"] = soup.title.string if soup.title else "No title"
+            content["page_text"] = soup.get_text(" ", strip=True)
+            
+            # Save the source code for inspection
+            domain = urlparse(url).netloc
+            source_file = os.path.join(self.output_dir, 'reports', f"{domain}_source.html")
+            with open(source_file, 'w', encoding='utf-8') as f:
+                f.write(content["source_code"])
+            logger.info(f"Source code saved to {source_file}")
+            
+            return content, url
         
         return content, None
 
     def capture_visual_data(self, url, content, domain):
         """Capture screenshot and process images for OCR"""
+        content = self.render_page(url, content, domain)
+        return self.ocr_page_images(content)
+
+    def render_page(self, url, content, domain):
+        """Capture screenshot and download page images for later OCR"""
         try:
-            # Navigate to the URL
-            self.driver.get(url)
-            time.sleep(3)  # Wait for page to fully load
-            
-            # 检查是否遇到SSL警告页面，尝试点击"高级"和"继续访问"按钮
-            try:
-                # 尝试查找常见的SSL警告页面元素
-                advanced_buttons = self.driver.find_elements("xpath", "//button[contains(text(), '高级') or contains(text(), 'Advanced')]")
-                if advanced_buttons:
-                    logger.info(f"Found SSL warning page, clicking advanced button")
-                    advanced_buttons[0].click()
-                    time.sleep(1)
-                    
-                    # 点击"继续访问"或"Proceed"按钮
-                    proceed_buttons = self.driver.find_elements("xpath", 
-                        "//a[contains(text(), '继续前往') or contains(text(), '继续访问') or contains(text(), 'Proceed')]")
-                    if proceed_buttons:
-                        proceed_buttons[0].click()
-                        logger.info(f"Clicked proceed button, continuing to insecure site")
-                        time.sleep(2)  # 等待页面加载
-            except Exception as e:
-                logger.warning(f"Error handling SSL warning page: {e}")
-            
-            # Take full page screenshot
-            screenshot_path = os.path.join(self.output_dir, 'images', f"{domain}_screenshot.png")
-            self.driver.save_screenshot(screenshot_path)
-            logger.info(f"Screenshot saved to {screenshot_path}")
-            content["screenshot_path"] = screenshot_path
-            
-            # Extract and download images for analysis
-            image_elements = self.driver.find_elements("tag name", "img")
-            logger.info(f"Found {len(image_elements)} images on the page")
-            image_ocr_text = []
-            
-            for i, img in enumerate(image_elements[:10]):  # Limit to first 10 images
+            with self.browser_pool.page() as driver:
+                # Navigate to the URL
                 try:
-                    img_src = img.get_attribute('src')
-                    if not img_src:
-                        continue
-                    
-                    # 跳过base64编码的小图片和图标
-                    if img_src.startswith('data:image') and len(img_src) < 1000:
-                        continue
+                    driver.get(url)
+                except TimeoutException:
+                    logger.warning(f"Page load timed out for {url}, using what has rendered so far")
+                self.browser_pool.wait_until_ready(driver)
+                
+                # 检查是否遇到SSL警告页面，尝试点击"高级"和"继续访问"按钮
+                try:
+                    # 尝试查找常见的SSL警告页面元素
+                    advanced_buttons = driver.find_elements("xpath", "//button[contains(text(), '高级') or contains(text(), 'Advanced')]")
+                    if advanced_buttons:
+                        logger.info(f"Found SSL warning page, clicking advanced button")
+                        advanced_buttons[0].click()
                         
-                    # Handle relative URLs
-                    if not img_src.startswith(('http://', 'https://')):
-                        img_src = urljoin(url, img_src)
-                    
-                    logger.info(f"Processing image {i}: {img_src[:100]}...")
-                    
-                    # Download and save image
+                        # 点击"继续访问"或"Proceed"按钮
+                        proceed_buttons = driver.find_elements("xpath", 
+                            "//a[contains(text(), '继续前往') or contains(text(), '继续访问') or contains(text(), 'Proceed')]")
+                        if proceed_buttons:
+                            proceed_buttons[0].click()
+                            logger.info(f"Clicked proceed button, continuing to insecure site")
+                            self.browser_pool.wait_until_ready(driver)  # 等待页面加载
+                except WebDriverException as e:
+                    logger.warning(f"Error handling SSL warning page: {e}")
+                
+                # Take full page screenshot
+                screenshot_path = os.path.join(self.output_dir, 'images', f"{domain}_screenshot.png")
+                driver.save_screenshot(screenshot_path)
+                logger.info(f"Screenshot saved to {screenshot_path}")
+                content["screenshot_path"] = screenshot_path
+                
+                # Collect image sources while the page is still loaded
+                image_elements = driver.find_elements("tag name", "img")
+                logger.info(f"Found {len(image_elements)} images on the page")
+                image_sources = []
+                for i, img in enumerate(image_elements[:10]):  # Limit to first 10 images
                     try:
-                        img_response = requests.get(img_src, timeout=self.timeout, verify=False)
-                        if img_response.status_code == 200:
-                            img_path = os.path.join(self.output_dir, 'images', f"{domain}_image_{i}.png")
-                            with open(img_path, 'wb') as img_file:
-                                img_file.write(img_response.content)
-                            logger.info(f"Saved image to {img_path}")
-                            
-                            # 验证图像是否正确保存
-                            if os.path.exists(img_path) and os.path.getsize(img_path) > 0:
-                                # Perform OCR on image
-                                ocr_text = self.extract_text_from_image(img_path)
-                                if ocr_text and ocr_text.strip():
-                                    logger.info(f"OCR Success: Extracted {len(ocr_text.strip())} chars from image {i}")
-                                    image_ocr_text.append(ocr_text)
-                                    content["images"].append({
-                                        "path": img_path,
-                                        "ocr_text": ocr_text,
-                                        "size": f"{size['width']}x{size['height']}"
-                                    })
-                                else:
-                                    logger.warning(f"OCR returned empty text for image {img_path}")
-                            else:
-                                logger.warning(f"Image file is invalid or empty: {img_path}")
+                        image_sources.append((i, img.get_attribute('src'), img.size))
                     except Exception as e:
-                        logger.warning(f"Error downloading image {img_src}: {e}")
-                except Exception as e:
-                    logger.warning(f"Error processing image {i}: {e}")
+                        logger.warning(f"Error processing image {i}: {e}")
             
-            # 如果没有从图像中提取到文本，尝试从截图中提取
-            if not image_ocr_text and os.path.exists(screenshot_path):
-                logger.info("No text extracted from individual images, trying full screenshot OCR")
-                screenshot_text = self.extract_text_from_image(screenshot_path)
-                if screenshot_text and screenshot_text.strip():
-                    image_ocr_text.append(screenshot_text)
-                    logger.info(f"Extracted {len(screenshot_text.strip())} chars from full screenshot")
-            
-            # Combine OCR text from all images
-            content["ocr_text"] = "\n\n".join(image_ocr_text)
-            logger.info(f"Total OCR text length: {len(content['ocr_text'])}")
+            for i, img_src, size in image_sources:
+                if not img_src:
+                    continue
+                
+                # 跳过base64编码的小图片和图标
+                if img_src.startswith('data:image') and len(img_src) < 1000:
+                    continue
+                    
+                # Handle relative URLs
+                if not img_src.startswith(('http://', 'https://')):
+                    img_src = urljoin(url, img_src)
+                
+                logger.info(f"Processing image {i}: {img_src[:100]}...")
+                
+                # Download and save image
+                try:
+                    img_path = os.path.join(self.output_dir, 'images', f"{domain}_image_{i}.png")
+                    cached = self.image_cache.get_url(img_src)
+                    if cached:
+                        # 近期下载过的图片直接从缓存复制，不再重复下载
+                        shutil.copyfile(cached["path"], img_path)
+                    else:
+                        img_response = self._loop.run(self.fetcher.fetch_url(img_src))
+                        if img_response["status"] != 200:
+                            continue
+                        with open(img_path, 'wb') as img_file:
+                            img_file.write(img_response["body"])
+                    logger.info(f"Saved image to {img_path}")
+                    
+                    # 验证图像是否正确保存
+                    if os.path.exists(img_path) and os.path.getsize(img_path) > 0:
+                        content["images"].append({
+                            "path": img_path,
+                            "url": img_src,
+                            "ocr_text": "",
+                            "size": f"{size['width']}x{size['height']}"
+                        })
+                    else:
+                        logger.warning(f"Image file is invalid or empty: {img_path}")
+                except Exception as e:
+                    logger.warning(f"Error downloading image {img_src}: {e}")
             
             return content
         except Exception as e:
             logger.error(f"Error capturing visual data: {e}")
             return content
 
-    def extract_text_from_image(self, image_path):
-        """Extract text from image using OCR"""
-        try:
-            # 验证图像文件
-            if not os.path.exists(image_path) or os.path.getsize(image_path) == 0:
-                logger.warning(f"Image file is missing or empty: {image_path}")
-                return ""
-            
-            # 使用EasyOCR进行识别
-            if ocr_reader is not None:
-                try:
-                    logger.info(f"Using EasyOCR to extract text from {image_path}")
-                    # 直接使用EasyOCR读取图像
-                    result = ocr_reader.readtext(image_path)
-                    
-                    # 提取文本内容并合并
-                    if result:
-                        texts = [text[1] for text in result]  # 每个元素的格式是: [[坐标], 文本内容, 置信度]
-                        full_text = '\n'.join(texts)
-                        
-                        # 输出识别结果统计
-                        char_count = len(full_text)
-                        text_count = len(texts)
-                        logger.info(f"EasyOCR extracted {text_count} text blocks, {char_count} characters from {image_path}")
-                        
-                        if char_count > 0:
-                            # 记录部分内容作为示例
-                            sample = full_text[:100] + "..." if len(full_text) > 100 else full_text
-                            logger.info(f"Sample text: {sample}")
-                            return full_text
-                except Exception as e:
-                    logger.error(f"EasyOCR error: {e}")
-            
-            # 如果EasyOCR失败或未配置，回退到Tesseract
-            logger.info(f"Falling back to Tesseract OCR for {image_path}")
-            # 检查Tesseract配置
-            if not hasattr(pytesseract.pytesseract, 'tesseract_cmd') or not os.path.exists(pytesseract.pytesseract.tesseract_cmd):
-                logger.error(f"Tesseract OCR not properly configured. Path: {pytesseract.pytesseract.tesseract_cmd}")
-                return ""
-                
-            # 读取图像
-            img = cv2.imread(image_path)
-            if img is None:
-                try:
-                    # 尝试用PIL读取
-                    pil_img = Image.open(image_path)
-                    img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-                except Exception as e:
-                    logger.error(f"Failed to read image: {e}")
-                    return ""
-            
-            # 使用Tesseract提取文本
-            ocr_lang = config.tesseract_lang if hasattr(config, 'tesseract_lang') else 'eng'
-            text = pytesseract.image_to_string(img, lang=ocr_lang)
-            
-            if text.strip():
-                logger.info(f"Tesseract extracted {len(text.strip())} characters from {image_path}")
+    def ocr_page_images(self, content):
+        """Run OCR over the downloaded images, falling back to the full screenshot"""
+        image_ocr_text = []
+        ocr_images = []
+        # All images of the page go to the OCR service at once and are batched with other pages
+        results = self.recognize_images([image["path"] for image in content["images"]],
+                                        [image["url"] for image in content["images"]])
+        for i, (image, result) in enumerate(zip(content["images"], results)):
+            ocr_text = result["text"]
+            if ocr_text and ocr_text.strip():
+                logger.info(f"OCR Success: Extracted {len(ocr_text.strip())} chars from image {i}")
+                image_ocr_text.append(ocr_text)
+                image["ocr_text"] = ocr_text
+                image["ocr_latency"] = round(result["latency"], 3)
+                ocr_images.append(image)
             else:
-                logger.warning(f"Tesseract failed to extract text from {image_path}")
-                
-            return text
-        except Exception as e:
-            logger.error(f"OCR error: {e}")
-            return ""
+                logger.warning(f"OCR returned empty text for image {image['path']}")
+        content["images"] = ocr_images
+        
+        # 如果没有从图像中提取到文本，尝试从截图中提取
+        screenshot_path = content.get("screenshot_path")
+        if not image_ocr_text and screenshot_path and os.path.exists(screenshot_path):
+            logger.info("No text extracted from individual images, trying full screenshot OCR")
+            screenshot_text = self.extract_text_from_image(screenshot_path)
+            if screenshot_text and screenshot_text.strip():
+                image_ocr_text.append(screenshot_text)
+                logger.info(f"Extracted {len(screenshot_text.strip())} chars from full screenshot")
+        
+        # Combine OCR text from all images
+        content["ocr_text"] = "\n\n".join(image_ocr_text)
+        logger.info(f"Total OCR text length: {len(content['ocr_text'])}")
+        return content
+
+    def recognize_images(self, image_paths, urls=None):
+        """OCR images through the content-addressed cache, so only unseen images reach the model"""
+        results = [None] * len(image_paths)
+        hashes = [None] * len(image_paths)
+        misses = []
+        for n, path in enumerate(image_paths):
+            try:
+                hashes[n] = ImageCache.hash_file(path)
+            except OSError:
+                misses.append(n)
+                continue
+            entry = self.image_cache.get(hashes[n])
+            if entry is not None:
+                results[n] = {"text": entry["ocr_text"], "latency": 0.0}
+                if urls and urls[n]:
+                    self.image_cache.put_url(urls[n], hashes[n])
+            else:
+                misses.append(n)
+        
+        for n, result in zip(misses, self.ocr.recognize([image_paths[n] for n in misses])):
+            results[n] = result
+            # Failed OCR (no engine loaded, unreadable image) is not cached, so it is retried next time
+            if hashes[n] and result.get("ok"):
+                self.image_cache.put(image_paths[n], hashes[n], result["text"], url=urls[n] if urls else None)
+        return results
+
+    def extract_text_from_image(self, image_path):
+        """Extract text from a full-page screenshot using OCR.
+
+        Screenshots are unique per host and large, so they bypass the image cache
+        instead of evicting the shared logos and banners it exists for.
+        """
+        return self.ocr.recognize([image_path])[0]["text"]
 
     def analyze_website(self, content, target_company, url=None):
         """Use OpenAI to analyze if website belongs to target company."""
@@ -395,18 +410,18 @@ class WebsiteAnalyzer:
             logger.info(f"Sending analysis request to OpenAI API for {url}")
             start_time = time.time()
             
-            response = self.client.chat.completions.create(
+            result, usage = self._loop.run(self.llm.chat(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an expert web analyst who can determine if a website belongs to a specific company based on its content. Respond only with the requested JSON."},
                     {"role": "user", "content": prompt}
                 ]
-            )
+            ))
             
-            # Get response
-            result = response.choices[0].message.content
             elapsed_time = time.time() - start_time
-            logger.info(f"OpenAI analysis completed for {url if url else 'unknown URL'} in {elapsed_time:.2f} seconds")
+            logger.info(f"OpenAI analysis completed for {url if url else 'unknown URL'} in {elapsed_time:.2f} seconds "
+                        f"(API latency {usage['latency']:.2f}s, {usage['prompt_tokens']}+{usage['completion_tokens']} tokens, "
+                        f"{usage['attempts']} attempt(s))")
             
             # Save the response for inspection
             response_log_path = os.path.join(self.output_dir, 'reports', f"{urlparse(url).netloc if url else 'unknown'}_response.json")
@@ -417,81 +432,352 @@ class WebsiteAnalyzer:
             return result
         except Exception as e:
             logger.error(f"Error during OpenAI analysis: {e}")
-            return {"belongs_to_target": False, "confidence": 0, "reasoning": f"Error during analysis: {str(e)}"}
+            return {"belongs_to_target": False, "confidence": 0, "reasoning": f"Error during analysis: {str(e)}",
+                    "error": True}
+
+    def analyze_websites_batch(self, tasks, target_company):
+        """Classify several hosts with one LLM request; returns {host: verdict} for the hosts that were answered."""
+        hosts = [urlparse(task["url"]).netloc for task in tasks]
+        evidence = "\n".join(
+            f"""
+        [{n + 1}] host: {host}
+            title: {task['content']['title']}
+            page text: {task['content'].get('page_text', '')[:300] or 'None'}
+            OCR text: {task['content']['ocr_text'][:300] or 'None'}"""
+            for n, (host, task) in enumerate(zip(hosts, tasks)))
+        prompt = f"""
+        For each website below, determine if it belongs to or is associated with {target_company}.
+        
+        Key indicators to look for:
+        1. Company name or variations in the title, headers, or content
+        2. Copyright information
+        3. Contact information matching the company
+        4. Brand-specific language or terminology
+        5. Product or service offerings matching the company
+        
+        Websites:
+        {evidence}
+        
+        Provide your analysis as a JSON array with exactly one object per website, in this format:
+        [
+            {{
+                "host": "the host exactly as given above",
+                "belongs_to_target": true/false,
+                "confidence": 0-100,
+                "reasoning": "Your short reasoning here",
+                "company_identifiers_found": ["list", "of", "identifiers"]
+            }}
+        ]
+        """
+        
+        # Every host in the batch links to the prompt that judged it
+        for host in hosts:
+            with open(os.path.join(self.output_dir, 'reports', f"{host}_prompt.txt"), 'w', encoding='utf-8') as f:
+                f.write(prompt)
+        
+        try:
+            logger.info(f"Sending batched analysis request to OpenAI API for {len(hosts)} hosts")
+            result, usage = self._loop.run(self.llm.chat(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are an expert web analyst who can determine if a website belongs to a specific company based on its content. Respond only with the requested JSON."},
+                    {"role": "user", "content": prompt}
+                ]
+            ))
+            logger.info(f"Batched OpenAI analysis completed for {len(hosts)} hosts in {usage['latency']:.2f} seconds "
+                        f"({usage['prompt_tokens']}+{usage['completion_tokens']} tokens)")
+            # 去掉模型可能添加的```json代码块标记
+            result = result.strip()
+            if result.startswith("```"):
+                result = result.strip("`")
+                result = result[result.index("\n") + 1:] if "\n" in result else result
+            verdicts = json.loads(result)
+            return {verdict["host"]: verdict for verdict in verdicts
+                    if isinstance(verdict, dict) and verdict.get("host") in hosts}
+        except Exception as e:
+            logger.warning(f"Batched analysis failed, falling back to single-host prompts: {e}")
+            return {}
 
-    def run_analysis(self, excel_file, target_company):
-        """Run the complete analysis process."""
+    @staticmethod
+    def _asset_store():
+        return AssetStore(getattr(config, 'asset_store_path', os.path.join('output', 'asset_store.sqlite')))
+
+    @staticmethod
+    def load_run(output_dir):
+        """Read the parameters of a previous run from its output directory"""
+        with open(os.path.join(output_dir, RUN_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_journal(self):
+        """Read finished hosts from the checkpoint journal as {host number: result entry}"""
+        return Journal(os.path.join(self.output_dir, JOURNAL_FILE)).load()
+
+    def run_analysis(self, excel_file, target_company, resume=False, diff=False):
+        """Run the complete analysis process.
+
+        With ``diff`` only hosts that are new or changed since they were last analyzed
+        (according to the shared asset store) are analyzed.
+        """
         ip_addresses = self.read_excel(excel_file)
-        results = []
+        if diff:
+            asset_store = self._asset_store()
+            try:
+                pending = asset_store.pending([asset_key(ip) for ip in ip_addresses], "analyze")
+            finally:
+                asset_store.close()
+            skipped = len(ip_addresses)
+            ip_addresses = [ip for ip in ip_addresses if asset_key(ip) in pending]
+            logger.info(f"Diff mode: skipping {skipped - len(ip_addresses)} hosts analyzed since they last changed")
         
         logger.info(f"Starting analysis of {len(ip_addresses)} IP addresses for company: {target_company}")
         logger.info(f"Using OpenAI API with model: {self.model}")
         
-        for i, ip in enumerate(ip_addresses):
-            logger.info(f"Analyzing {ip} ({i+1}/{len(ip_addresses)})")
-            
-            content, url = self.get_website_content(ip)
-            if not content["source_code"]:
-                logger.warning(f"Could not fetch content from {ip}")
-                results.append({
-                    "ip": ip,
-                    "url": url,
-                    "accessible": False,
-                    "title": "N/A",
-                    "belongs_to_target": False,
-                    "confidence": 0,
-                    "reasoning": "Could not access website",
-                    "screenshot_path": None,
-                    "ocr_text": ""
-                })
-                continue
-                
-            analysis = self.analyze_website(content, target_company, url)
-            
-            # Process analysis result
+        # 每完成一个目标就追加写入检查点日志，中断后可通过resume跳过已完成的目标
+        done = self.load_journal() if resume else {}
+        if done:
+            logger.info(f"Resuming run: {len(done)} of {len(ip_addresses)} hosts already finished")
+            # Finish with the model that produced the journaled verdicts so one report never mixes two models
             try:
-                if isinstance(analysis, str):
-                    analysis_dict = json.loads(analysis)
-                else:
-                    analysis_dict = analysis
-            except Exception as e:
-                logger.error(f"Could not parse LLM response as JSON for {ip}: {e}")
-                analysis_dict = {
-                    "belongs_to_target": False,
-                    "confidence": 0,
-                    "reasoning": "Error parsing analysis result"
-                }
+                run_model = self.load_run(self.output_dir).get("model")
+            except (OSError, ValueError):
+                run_model = None
+            if run_model and run_model != self.model:
+                logger.warning(f"Resuming with the model of the interrupted run ({run_model}) instead of {self.model}")
+                self.model = run_model
+        else:
+            with open(os.path.join(self.output_dir, RUN_FILE), 'w', encoding='utf-8') as f:
+                json.dump({"excel_file": os.path.abspath(excel_file), "target_company": target_company,
+                           "model": self.model, "started": datetime.now().isoformat()}, f, ensure_ascii=False)
+        results = dict(done)
+        analyzed = []  # hosts that were reached and got a verdict, recorded in the asset store for --diff
+        
+        # 本地规则预筛选，只有难以判断的目标才交给LLM
+        self.prefilter = PreFilter(
+            target_company,
+            aliases=getattr(config, 'company_aliases', []),
+            positive_threshold=getattr(config, 'prefilter_positive', 80),
+            negative_threshold=getattr(config, 'prefilter_negative', -50)
+        ) if getattr(config, 'prefilter_enabled', True) else None
+        
+        # 抓取、截图、OCR、LLM四个阶段各自拥有独立的线程池，通过有界队列串联
+        stages = [
+            Stage("fetch", self._fetch_stage, workers=self.fetch_workers, on_error=self._stage_error),
+            Stage("render", self._render_stage, workers=self.render_workers, on_error=self._stage_error),
+            Stage("ocr", self._ocr_stage, workers=self.ocr_workers, on_error=self._stage_error),
+        ]
+        if self.llm_batch_size > 1:
+            stages.append(Stage("llm", lambda batch: self._llm_batch_stage(batch, target_company),
+                                workers=self.llm_workers, on_error=self._stage_error, batch_size=self.llm_batch_size))
+        else:
+            stages.append(Stage("llm", lambda task: self._llm_stage(task, target_company), workers=self.llm_workers,
+                                on_error=self._stage_error))
+        tasks = ({"no": i + 1, "total": len(ip_addresses), "ip": ip, "url": None, "content": None, "analysis": None}
+                 for i, ip in enumerate(ip_addresses) if i + 1 not in done)
+        
+        csv_file = os.path.join(self.output_dir, f"{target_company}_analysis_results.csv")
+        resumed = sorted(done)  # journaled hosts are written back in input order around the new ones
+        with Journal(os.path.join(self.output_dir, JOURNAL_FILE)).open() as journal, \
+                open(csv_file, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
             
-            # Create result entry with all fields
-            result_entry = {
-                "ip": ip,
-                "url": url,
-                "accessible": True,
-                "title": content["title"],
-                "belongs_to_target": analysis_dict.get("belongs_to_target", False),
-                "confidence": analysis_dict.get("confidence", 0),
-                "reasoning": analysis_dict.get("reasoning", "No reasoning provided"),
-                "identifiers": analysis_dict.get("company_identifiers_found", []),
-                "screenshot_path": content.get("screenshot_path"),
-                "ocr_text": content.get("ocr_text", "")
-            }
+            def write_row(no):
+                writer.writerow(results[no])
+                f.flush()
             
-            results.append(result_entry)
+            def record(index, task):
+                # Called as soon as each host finishes (not in input order), so a crash never loses a
+                # finished host that was still waiting behind a slower one
+                result_entry = self._build_result(task)
+                results[task["no"]] = result_entry
+                if result_entry["accessible"] and task["analysis"] and not task["analysis"].get("error"):
+                    analyzed.append(task["ip"])
+                if result_entry["accessible"]:
+                    try:
+                        self.generate_site_report(task["ip"], task["url"], task["content"], task["analysis"],
+                                                  target_company)
+                    except Exception as e:
+                        # A broken report must not abort the run and lose the other results
+                        logger.error(f"Error generating report for {task['ip']}: {e}")
+                journal.write(task["no"], result_entry)
             
-            # Generate detailed HTML report for this site
-            self.generate_site_report(ip, url, content, analysis_dict, target_company)
+            def emit(index, task):
+                # Called in input order: stream the host's row once every earlier host is written
+                while resumed and resumed[0] < task["no"]:
+                    write_row(resumed.pop(0))
+                write_row(task["no"])
+            
+            Pipeline(stages, queue_size=self.queue_size).run(tasks, emit, on_complete=record)
+            for no in resumed:
+                write_row(no)
+        results = [results[no] for no in sorted(results)]
+        if diff and analyzed:
+            # Unreachable hosts and failed LLM calls are left pending so the next --diff run retries them
+            asset_store = self._asset_store()
+            try:
+                asset_store.mark([asset_key(ip) for ip in analyzed], "analyze")
+            finally:
+                asset_store.close()
         
         # Save results to Excel
-        result_df = pd.DataFrame(results)
+        result_df = pd.DataFrame(results, columns=RESULT_FIELDS)
         output_file = os.path.join(self.output_dir, f"{target_company}_analysis_results.xlsx")
         result_df.to_excel(output_file, index=False)
         logger.info(f"Analysis complete. Results saved to {output_file}")
+        logger.info(f"Image cache: {self.image_cache.hits} hits, {self.image_cache.misses} misses")
+        if self.probe_store is not None:
+            logger.info(f"Reused {self.probe_store.hits} pages from the liveness probe store")
+        llm_stats = self.llm.stats()
+        logger.info(f"LLM usage: {llm_stats['calls']} calls, {llm_stats['retries']} retries, "
+                    f"{llm_stats['prompt_tokens']}+{llm_stats['completion_tokens']} tokens, "
+                    f"avg latency {llm_stats['avg_latency']:.2f}s")
+        logger.info(f"Verdict cache: {self.verdict_cache.hits} hits, {self.verdict_cache.misses} misses, "
+                    f"{self.verdict_cache.coalesced} coalesced")
         
         # Generate summary HTML report
         self.generate_summary_report(results, target_company)
         
         return results
 
+    def _fetch_stage(self, task):
+        logger.info(f"Analyzing {task['ip']} ({task['no']}/{task['total']})")
+        task["content"], task["url"] = self.fetch_page(task["ip"])
+        if not task["content"]["source_code"]:
+            logger.warning(f"Could not fetch content from {task['ip']}")
+        else:
+            # Obvious hosts are decided from the HTML alone and skip rendering, OCR and the LLM
+            self._prefilter(task, rendered=False)
+        return task
+
+    def _render_stage(self, task):
+        if task["url"] and task["content"]["source_code"] and self.browser_pool and not task.get("decided_by"):
+            task["content"] = self.render_page(task["url"], task["content"], urlparse(task["url"]).netloc)
+        return task
+
+    def _ocr_stage(self, task):
+        if task["url"] and task["content"]["source_code"] and not task.get("decided_by"):
+            task["content"] = self.ocr_page_images(task["content"])
+            self._prefilter(task)
+        return task
+
+    def _prefilter(self, task, rendered=True):
+        if not self.prefilter:
+            return
+        verdict = self.prefilter.evaluate(task["content"], rendered)
+        if verdict is not None:
+            logger.info(f"Pre-filter decided {task['ip']}: belongs_to_target={verdict['belongs_to_target']}")
+            task["analysis"], task["decided_by"] = verdict, "prefilter"
+            self._save_verdict(task)
+
+    def _llm_stage(self, task, target_company):
+        if not task["content"]["source_code"] or task.get("decided_by"):
+            return task
+        content = task["content"]
+        fingerprint = VerdictCache.fingerprint(target_company, self.model, content["title"], content["ocr_text"],
+                                               content.get("page_text", ""))
+        task["analysis"], task["decided_by"] = self.verdict_cache.get_or_compute(
+            fingerprint, lambda: self._analyze(task, target_company))
+        if task["decided_by"] != "llm":
+            logger.info(f"Reusing cached verdict for {task['ip']} ({task['decided_by']})")
+            self._save_verdict(task)
+        return task
+
+    def _llm_batch_stage(self, tasks, target_company):
+        """Classify a batch of hosts with one request, falling back to single-host prompts"""
+        pending = []
+        for task in tasks:
+            if not task["content"]["source_code"] or task.get("decided_by"):
+                continue
+            content = task["content"]
+            evidence = (target_company, self.model, content["title"], content["ocr_text"],
+                        content.get("page_text", ""))
+            # 批量提示词只看到每个目标的部分内容，其结论单独缓存，不会顶替完整的单目标结论
+            verdict = self.verdict_cache.lookup(VerdictCache.fingerprint(*evidence))
+            fingerprint = VerdictCache.fingerprint(*evidence, mode="batch")
+            if verdict is None:
+                verdict = self.verdict_cache.lookup(fingerprint)
+            if verdict is not None:
+                task["analysis"], task["decided_by"] = verdict, "cache"
+                self._save_verdict(task)
+            else:
+                pending.append((task, fingerprint))
+        
+        answers = self.analyze_websites_batch([task for task, _ in pending], target_company) if len(pending) > 1 else {}
+        for task, fingerprint in pending:
+            verdict = answers.get(urlparse(task["url"]).netloc)
+            if isinstance(verdict, dict) and "belongs_to_target" in verdict:
+                task["analysis"], task["decided_by"] = verdict, "llm-batch"
+                self.verdict_cache.record(fingerprint, verdict)
+                self._save_verdict(task)
+            else:
+                self._llm_stage(task, target_company)
+        return tasks
+
+    def _save_verdict(self, task):
+        """Write the verdict where the per-site report expects the model response"""
+        response_log_path = os.path.join(self.output_dir, 'reports', f"{urlparse(task['url']).netloc}_response.json")
+        with open(response_log_path, 'w', encoding='utf-8') as f:
+            json.dump(task["analysis"], f, ensure_ascii=False)
+
+    def _analyze(self, task, target_company):
+        """Ask the LLM for a verdict; returns (analysis_dict, ok) where only ok verdicts are cached"""
+        analysis = self.analyze_website(task["content"], target_company, task["url"])
+        
+        # Process analysis result
+        try:
+            if isinstance(analysis, str):
+                return json.loads(analysis), True
+            # analyze_website only returns a dict when the API call itself failed
+            return analysis, False
+        except Exception as e:
+            logger.error(f"Could not parse LLM response as JSON for {task['ip']}: {e}")
+            return {
+                "belongs_to_target": False,
+                "confidence": 0,
+                "reasoning": "Error parsing analysis result",
+                "error": True
+            }, False
+
+    def _stage_error(self, task, error):
+        if task["content"] is None:
+            task["content"] = {"source_code": "", "title": "", "status_code": None,
+                               "screenshot_path": None, "images": [], "ocr_text": "", "page_text": ""}
+        if task["content"]["source_code"] and task["analysis"] is None:
+            task["analysis"] = {"belongs_to_target": False, "confidence": 0,
+                                "reasoning": f"Error during analysis: {str(error)}", "error": True}
+        return task
+
+    def _build_result(self, task):
+        """Create the result entry for a finished pipeline task"""
+        content = task["content"]
+        if not content["source_code"]:
+            return {
+                "ip": task["ip"],
+                "url": task["url"],
+                "accessible": False,
+                "title": "N/A",
+                "belongs_to_target": False,
+                "confidence": 0,
+                "reasoning": "Could not access website",
+                "decided_by": "unreachable",
+                "screenshot_path": None,
+                "ocr_text": ""
+            }
+        analysis_dict = task["analysis"] or {}
+        return {
+            "ip": task["ip"],
+            "url": task["url"],
+            "accessible": True,
+            "title": content["title"],
+            "belongs_to_target": analysis_dict.get("belongs_to_target", False),
+            "confidence": analysis_dict.get("confidence", 0),
+            "reasoning": analysis_dict.get("reasoning", "No reasoning provided"),
+            "identifiers": analysis_dict.get("company_identifiers_found", []),
+            "decided_by": task.get("decided_by", "llm"),
+            "screenshot_path": content.get("screenshot_path"),
+            "ocr_text": content.get("ocr_text", "")
+        }
+
     def generate_site_report(self, ip, url, content, analysis, target_company):
         """Generate detailed HTML report for a single site"""
         if not url:
@@ -499,6 +785,13 @@ class WebsiteAnalyzer:
             
         domain = urlparse(url).netloc
         report_path = os.path.join(self.output_dir, 'reports', f"{domain}_report.html")
+        # Hosts decided from the HTML alone are never rendered, so they have no screenshot
+        screenshot_path = content.get('screenshot_path')
+        if screenshot_path:
+            screenshot_html = (f'<img src="../images/{os.path.basename(screenshot_path)}" alt="Website Screenshot" '
+                               f'class="screenshot"/>')
+        else:
+            screenshot_html = '<p>No screenshot (decided before rendering)</p>'
         
         html = f"""<!DOCTYPE html>
         <html>
@@ -545,7 +838,7 @@ class WebsiteAnalyzer:
                     </div>
                     
                     <h2>Screenshot</h2>
-                    <img src="../images/{os.path.basename(content.get('screenshot_path', ''))}" alt="Website Screenshot" class="screenshot"/>
+                    {screenshot_html}
                 </div>
                 
                 <div class="column">
@@ -559,7 +852,7 @@ class WebsiteAnalyzer:
                     
                     <h2>Images Analyzed</h2>
                     <div class="image-container">
-                        {"".join([f'<div class="image-item"><img src="../images/{os.path.basename(img["path"])}" alt="Image {i}"/><p>{img["ocr_text"][:100]}...</p></div>' for i, img in enumerate(content.get('images', []))])}
+                        {"".join([f'<div class="image-item"><img src="../images/{os.path.basename(img["path"])}" alt="Image {i}"/><p>{img["ocr_text"][:100]}...</p><p><small>OCR: {img.get("ocr_latency", 0) * 1000:.0f} ms</small></p></div>' for i, img in enumerate(content.get('images', []))])}
                     </div>
                 </div>
             </div>
@@ -583,6 +876,10 @@ class WebsiteAnalyzer:
     def generate_summary_report(self, results, target_company):
         """Generate summary HTML report for all analyzed sites"""
         report_path = os.path.join(self.output_dir, 'reports', f"{target_company}_summary_report.html")
+        llm_stats = self.llm.stats()
+        decision_paths = {}
+        for r in results:
+            decision_paths[r.get('decided_by', 'llm')] = decision_paths.get(r.get('decided_by', 'llm'), 0) + 1
         
         html = f"""<!DOCTYPE html>
         <html>
@@ -606,6 +903,9 @@ class WebsiteAnalyzer:
             <p><strong>Total Sites Analyzed:</strong> {len(results)}</p>
             <p><strong>Sites Belonging to Target:</strong> {sum(1 for r in results if r.get('belongs_to_target'))}</p>
             <p><strong>Analysis Method:</strong> OpenAI API with model: {self.model}</p>
+            <p><strong>LLM Usage:</strong> {llm_stats['calls']} calls, {llm_stats['retries']} retries, {llm_stats['prompt_tokens']} prompt + {llm_stats['completion_tokens']} completion tokens, average latency {llm_stats['avg_latency']:.2f}s</p>
+            <p><strong>Verdict Cache:</strong> {self.verdict_cache.hits} hits, {self.verdict_cache.misses} misses, {self.verdict_cache.coalesced} coalesced</p>
+            <p><strong>Decision Paths:</strong> {", ".join(f"{path}: {count}" for path, count in sorted(decision_paths.items()))}</p>
             
             <h2>Results Table</h2>
             <table>
@@ -615,6 +915,7 @@ class WebsiteAnalyzer:
                     <th>Title</th>
                     <th>Belongs to Target</th>
                     <th>Confidence</th>
+                    <th>Decided By</th>
                     <th>Reports</th>
                 </tr>
                 {"".join([f'''
@@ -624,6 +925,7 @@ class WebsiteAnalyzer:
                     <td>{r.get('title', 'N/A')}</td>
                     <td class="belongs-{'true' if r.get('belongs_to_target') else 'false'}">{r.get('belongs_to_target', False)}</td>
                     <td>{r.get('confidence', 0)}%</td>
+                    <td>{r.get('decided_by', 'llm')}</td>
                     <td>
                         <a href="{urlparse(r.get('url', '')).netloc if r.get('url') else 'unknown'}_report.html" class="site-link">Detailed Report</a>
                         <a href="{urlparse(r.get('url', '')).netloc if r.get('url') else 'unknown'}_source.html" class="site-link">Source</a>
@@ -640,9 +942,20 @@ class WebsiteAnalyzer:
 
     def cleanup(self):
         """Clean up resources"""
-        if self.driver:
+        self.ocr.close()
+        self.image_cache.close()
+        self.verdict_cache.close()
+        if self.probe_store is not None:
+            self.probe_store.close()
+        try:
+            self._loop.run(self.fetcher.close())
+            self._loop.run(self.llm.close())
+            self._loop.close()
+        except Exception as e:
+            logger.error(f"Error closing HTTP session: {e}")
+        if self.browser_pool:
             try:
-                self.driver.quit()
+                self.browser_pool.close()
                 logger.info("Browser closed successfully")
             except Exception as e:
                 logger.error(f"Error closing browser: {e}")
@@ -650,29 +963,45 @@ class WebsiteAnalyzer:
 
 def main():
     parser = argparse.ArgumentParser(description="Analyze websites to determine if they belong to a specific company")
-    parser.add_argument("excel_file", help="Path to Excel file containing IP addresses")
-    parser.add_argument("target_company", help="The target company name to check for")
+    parser.add_argument("excel_file", nargs="?", help="Path to Excel file containing IP addresses")
+    parser.add_argument("target_company", nargs="?", help="The target company name to check for")
     parser.add_argument("--model", help="OpenAI model to use for analysis", default=config.model)
+    parser.add_argument("--batch_size", type=int, help="Number of hosts classified per LLM request (1 disables batching)")
+    parser.add_argument("--resume", help="Output directory of an interrupted run to resume")
+    parser.add_argument("--diff", action="store_true", help="Only analyze hosts that are new or changed since the last run")
     args = parser.parse_args()
     
-    # Create timestamp-based output directory
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_dir = os.path.join('output', f'analysis_{timestamp}')
+    if args.resume:
+        # Reuse the interrupted run's directory and parameters
+        output_dir = args.resume
+        run = WebsiteAnalyzer.load_run(output_dir)
+        args.excel_file = args.excel_file or run["excel_file"]
+        args.target_company = args.target_company or run["target_company"]
+    elif not (args.excel_file and args.target_company):
+        parser.error("excel_file and target_company are required unless --resume is given")
+    else:
+        # Create timestamp-based output directory
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = os.path.join('output', f'analysis_{timestamp}')
     
     analyzer = WebsiteAnalyzer(output_dir=output_dir)
     analyzer.model = args.model  # Set the model from command line argument
+    if args.batch_size:
+        analyzer.llm_batch_size = args.batch_size
     
     try:
-        analyzer.run_analysis(args.excel_file, args.target_company)
+        analyzer.run_analysis(args.excel_file, args.target_company, resume=bool(args.resume), diff=args.diff)
     finally:
         analyzer.cleanup()
     
     logger.info(f"Analysis completed. Reports available in: {output_dir}")
     print(f"\nAnalysis completed successfully!")
     print(f"- Results are saved in: {os.path.join(output_dir, f'{args.target_company}_analysis_results.xlsx')}")
+    print(f"- Rows in input order (written during the run): "
+          f"{os.path.join(output_dir, f'{args.target_company}_analysis_results.csv')}")
     print(f"- Detailed HTML reports available in: {os.path.join(output_dir, 'reports')}")
     print(f"- Summary report: {os.path.join(output_dir, 'reports', f'{args.target_company}_summary_report.html')}")
-    print(f"- Using OpenAI API with model: {args.model}")
+    print(f"- Using OpenAI API with model: {analyzer.model}")
 
 
 if __name__ == "__main__":